@@ -0,0 +1,26 @@
+import time
+
+from django.core.cache.backends import filebased
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    """
+    Файловый кэш, который считает записи не при каждой записи,
+    а не чаще раза в CULL_INTERVAL секунд: для подсчёта читается
+    весь каталог кэша, и с ростом кэша запись становилась бы
+    всё дороже. Между проверками записей может стать больше
+    MAX_ENTRIES.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get('OPTIONS', {})
+        self._cull_interval = options.get('CULL_INTERVAL', 60)
+        self._next_cull = 0
+
+    def _cull(self):
+        now = time.monotonic()
+        if now < self._next_cull:
+            return
+        self._next_cull = now + self._cull_interval
+        super()._cull()
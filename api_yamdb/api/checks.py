@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from rest_framework.settings import api_settings
+
+# Кэши, которые не видны другим процессам сервера
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, Tags.security)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Кэш Django должен быть общим для процессов сервера.
+    StatelessJWTAuthentication берёт из него версии токенов:
+    с кэшем в памяти процесса отозванный токен продолжит
+    приниматься другими процессами.
+    """
+
+    from api.v1.authentication import StatelessJWTAuthentication
+
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    hint = 'Укажите в CACHES файловый кэш, Redis или Memcached.'
+    if any(
+        issubclass(authentication, StatelessJWTAuthentication)
+        for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ):
+        return [Error(
+            'StatelessJWTAuthentication требует общего для процессов кэша.',
+            hint=hint,
+            obj=backend,
+            id='api.E001',
+        )]
+    # Версии ответов (ETag), кэш ответов, ожидание построения ответа
+    # и повторов по Idempotency-Key работают только в пределах процесса
+    return [Warning(
+        'Кэш ответов, ETag и ключи идемпотентности не видны другим '
+        'процессам сервера.',
+        hint=hint,
+        obj=backend,
+        id='api.W001',
+    )]
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import User
+from users.tokens import TOKEN_VERSION_CLAIM, current_token_version
+
+
+class RoleTokenUser(TokenUser):
+    """
+    Пользователь, построенный по утверждениям токена без запроса к БД.
+    Роль и флаги проверяются разрешениями так же, как у модели User.
+    """
+
+    @cached_property
+    def role(self):
+        return self.token.get('role', User.USER)
+
+    @property
+    def is_moderator(self):
+        return self.role == User.MODERATOR
+
+    @property
+    def is_admin(self):
+        return (
+            self.role == User.ADMIN
+            or self.is_superuser
+            or self.is_staff
+        )
+
+
+class VerifiedTokenCache:
+    """
+    LRU-кэш проверенных токенов в памяти процесса. Ключ - sha256
+    строки токена, значение - проверенный токен и время exp, после
+    которого запись удаляется. При переполнении вытесняется токен,
+    который дольше всех не использовался.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.tokens = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @staticmethod
+    def make_key(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.tokens.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            token, expires = entry
+            if expires <= time.time():
+                del self.tokens[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.tokens.move_to_end(key)
+            self.hits += 1
+            return token
+
+    def set(self, key, token):
+        expires = token.get('exp')
+        if not self.maxsize or expires is None:
+            return
+        with self.lock:
+            self.tokens[key] = (token, expires)
+            self.tokens.move_to_end(key)
+            while len(self.tokens) > self.maxsize:
+                self.tokens.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+            self.hits = self.misses = self.evictions = self.expired = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.tokens),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expired': self.expired,
+            }
+
+
+verified_tokens = VerifiedTokenCache(settings.JWT_VERIFIED_TOKEN_CACHE_SIZE)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без загрузки пользователя из БД для токенов
+    с ролью (users.tokens.access_token_for). Версия токена сверяется
+    с текущей версией пользователя в кэше, так что после смены роли,
+    блокировки или удаления токен сразу перестаёт действовать.
+    Токены без версии проверяются по БД, как раньше.
+    Проверенные токены запоминаются в verified_tokens, и повторный
+    запрос с тем же токеном не разбирает его и не проверяет подпись.
+    """
+
+    token_cache = verified_tokens
+
+    def get_validated_token(self, raw_token):
+        if not self.token_cache.maxsize:
+            return super().get_validated_token(raw_token)
+        key = self.token_cache.make_key(raw_token)
+        token = self.token_cache.get(key)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            self.token_cache.set(key, token)
+        return token
+
+    def get_user(self, validated_token):
+        if TOKEN_VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        if validated_token[TOKEN_VERSION_CLAIM] != current_token_version(
+            user_id
+        ):
+            raise AuthenticationFailed(
+                'Роль или статус пользователя изменились, '
+                'получите новый токен',
+                code='token_version_changed'
+            )
+        return RoleTokenUser(validated_token)
@@ -0,0 +1,150 @@
+"""
+Пакетный запрос: несколько вызовов API за одно обращение к серверу.
+
+Подзапросы выполняются в том же процессе через представления
+router_v1 по очереди, с пользователем, уже определённым для пакета,
+и на одном подключении к БД. С atomic все подзапросы выполняются
+в одной транзакции, которая откатывается при первой ошибке.
+"""
+import contextlib
+import io
+import json
+import logging
+import sys
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from api.v1.serializers import BatchSerializer
+
+logger = logging.getLogger(__name__)
+
+# заголовки, которые подзапрос не может задать сам
+IGNORED_HEADERS = {'AUTHORIZATION', 'COOKIE', 'HOST', 'CONTENT_TYPE'}
+
+
+def batch_views():
+    from api.v1.urls import router_v1
+
+    return {viewset for prefix, viewset, basename in router_v1.registry}
+
+
+def build_subrequest(request, item):
+    """
+    WSGI-запрос для подзапроса. Аутентификация не повторяется:
+    DRF использует пользователя и токен, переданные в _force_auth_*.
+    """
+
+    body = item.get('body')
+    payload = json.dumps(body).encode() if body is not None else b''
+    url = urlsplit(item['path'])
+    environ = {
+        'REQUEST_METHOD': item['method'],
+        # PATH_INFO в WSGI уже раскодирован и хранится в latin-1
+        'PATH_INFO': unquote_to_bytes(url.path).decode('iso-8859-1'),
+        'QUERY_STRING': url.query,
+        'SCRIPT_NAME': request.META.get('SCRIPT_NAME', ''),
+        'SERVER_NAME': request.META.get('SERVER_NAME', 'localhost'),
+        'SERVER_PORT': request.META.get('SERVER_PORT', '80'),
+        'SERVER_PROTOCOL': request.META.get('SERVER_PROTOCOL', 'HTTP/1.1'),
+        'REMOTE_ADDR': request.META.get('REMOTE_ADDR', ''),
+        'HTTP_HOST': request.get_host(),
+        'HTTP_ACCEPT': 'application/json',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': io.BytesIO(payload),
+        'wsgi.errors': request.META.get('wsgi.errors', sys.stderr),
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in item.get('headers', {}).items():
+        name = name.upper().replace('-', '_')
+        if name not in IGNORED_HEADERS:
+            environ[f'HTTP_{name}'] = value
+    subrequest = WSGIRequest(environ)
+    # без токена подзапрос аутентифицируется как обычно: проверять
+    # нечего, а ответ без прав остаётся 401, а не 403
+    if request.user.is_authenticated:
+        subrequest._force_auth_user = request.user
+        subrequest._force_auth_token = request.auth
+    return subrequest
+
+
+def response_body(response):
+    if isinstance(response, Response):
+        return response.data
+    if not response.content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(response.content)
+    return response.content.decode(response.charset)
+
+
+def run_subrequest(request, item, views):
+    subrequest = build_subrequest(request, item)
+    try:
+        match = resolve(subrequest.path_info)
+    except Resolver404:
+        match = None
+    if match is None or getattr(match.func, 'cls', None) not in views:
+        return {
+            'status': status.HTTP_404_NOT_FOUND,
+            'headers': {},
+            'body': {'detail': 'Страница не найдена.'},
+        }
+    try:
+        response = match.func(subrequest, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception('Ошибка подзапроса %s', item['path'])
+        return {
+            'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+            'headers': {},
+            'body': {'detail': 'Ошибка сервера.'},
+        }
+    if isinstance(response, Response):
+        # Content-Type ответа DRF выставляется при отрисовке
+        response.render()
+    return {
+        'status': response.status_code,
+        'headers': dict(response.items()),
+        'body': response_body(response),
+    }
+
+
+@api_view(('POST',))
+def batch(request):
+    """
+    Выполняем подзапросы по порядку и возвращаем список ответов.
+    В режиме atomic после первого ответа с ошибкой транзакция
+    откатывается, а остальные подзапросы не выполняются (424).
+    """
+
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    atomic = serializer.validated_data['atomic']
+    views = batch_views()
+    responses = []
+    failed = False
+    with transaction.atomic() if atomic else contextlib.nullcontext():
+        for item in serializer.validated_data['requests']:
+            if failed:
+                responses.append({
+                    'status': status.HTTP_424_FAILED_DEPENDENCY,
+                    'headers': {},
+                    'body': {'detail': 'Пакет отменён из-за ошибки.'},
+                })
+                continue
+            result = run_subrequest(request, item, views)
+            responses.append(result)
+            if atomic and result['status'] >= 400:
+                failed = True
+                transaction.set_rollback(True)
+    return Response(responses)
@@ -0,0 +1,117 @@
+from collections import defaultdict
+
+from rest_framework import serializers
+
+from reviews.models import GenreTitle
+
+datetime_to_representation = serializers.DateTimeField().to_representation
+
+
+def rating_to_representation(rating_sum, rating_count):
+    if not rating_count:
+        return None
+    return int(rating_sum / rating_count)
+
+
+def category_to_representation(name, slug):
+    if slug is None:
+        return None
+    return {'name': name, 'slug': slug}
+
+
+class ValuesSerializer:
+    """
+    Быстрое представление списка только для чтения.
+    Словари ответа строятся прямо из строк .values() без создания
+    моделей и полей DRF, результат совпадает с обычным сериализатором.
+    columns - поле ответа: (поля модели, функция преобразования),
+    функция None означает, что значение выводится как есть.
+    required_columns всегда выбираются из БД (например, для пагинации).
+    """
+
+    columns = {}
+    required_columns = ('pk',)
+
+    def __init__(self, fields):
+        lookups = list(self.required_columns)
+        self.plan = []
+        for name in fields:
+            columns, converter = self.columns[name]
+            for column in columns:
+                if column not in lookups:
+                    lookups.append(column)
+            self.plan.append((name, columns, converter))
+        self.fields = tuple(fields)
+        self.lookups = tuple(lookups)
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values(*self.lookups)
+
+    def to_representation(self, rows):
+        data = []
+        for row in rows:
+            item = {}
+            for name, columns, converter in self.plan:
+                if converter is None:
+                    item[name] = row[columns[0]]
+                else:
+                    item[name] = converter(*map(row.__getitem__, columns))
+            data.append(item)
+        return data
+
+
+class CommentValuesSerializer(ValuesSerializer):
+    columns = {
+        'id': (('id',), None),
+        'text': (('text',), None),
+        'author': (('author__username',), None),
+        'pub_date': (('pub_date',), datetime_to_representation),
+    }
+    required_columns = ('pk', 'pub_date')
+
+
+class ReviewValuesSerializer(ValuesSerializer):
+    columns = {
+        'id': (('id',), None),
+        'text': (('text',), None),
+        'author': (('author__username',), None),
+        'score': (('score',), None),
+        'pub_date': (('pub_date',), datetime_to_representation),
+    }
+    required_columns = ('pk', 'pub_date')
+
+
+class TitleValuesSerializer(ValuesSerializer):
+    """
+    Жанры всех произведений страницы загружаются одним запросом.
+    """
+
+    columns = {
+        'id': (('id',), None),
+        'name': (('name',), None),
+        'year': (('year',), None),
+        'rating': (('rating_sum', 'rating_count'), rating_to_representation),
+        'description': (('description',), None),
+        'genre': ((), list),
+        'category': (
+            ('category__name', 'category__slug'),
+            category_to_representation
+        ),
+    }
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        data = super().to_representation(rows)
+        if 'genre' not in self.fields:
+            return data
+        genres = defaultdict(list)
+        links = GenreTitle.objects.filter(
+            title_id__in={row['pk'] for row in rows}
+        ).order_by('genre__slug').values_list(
+            'title_id', 'genre__name', 'genre__slug'
+        )
+        for title_id, name, slug in links:
+            genres[title_id].append({'name': name, 'slug': slug})
+        for row, item in zip(rows, data):
+            item['genre'] = genres[row['pk']]
+        return data
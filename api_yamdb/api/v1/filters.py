@@ -1,17 +1,123 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Q
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
 
-from reviews.models import Title
+from reviews.caches import categories, titles_with_genres
+from reviews.models import GenreTitle, Title
+from reviews.search import TitleFTSRank, build_match_query, fts_available
+from users.fields import normalize
+
+# Верхняя граница диапазона строк, начинающихся с префикса
+MAX_CHAR = chr(0x10FFFF)
 
 
 class TitleFilter(filters.FilterSet):
     """
     Фильтрация произведений по полям.
+    genre принимает несколько слагов через запятую,
+    genre_mode задаёт, нужны все жанры (all) или любой из них (any).
     """
 
-    genre = filters.CharFilter(field_name='genre__slug')
-    category = filters.CharFilter(field_name='category__slug')
+    GENRE_ALL = 'all'
+    GENRE_ANY = 'any'
+    GENRE_MODES = (
+        (GENRE_ALL, 'Все жанры'),
+        (GENRE_ANY, 'Любой из жанров'),
+    )
+
+    genre = filters.CharFilter(method='filter_genre')
+    genre_mode = filters.ChoiceFilter(
+        choices=GENRE_MODES,
+        method='filter_genre_mode'
+    )
+    category = filters.CharFilter(method='filter_category')
     name = filters.CharFilter(field_name='name', lookup_expr='icontains')
 
     class Meta:
         model = Title
-        fields = ('genre', 'category', 'name', 'year')
+        fields = ('genre', 'genre_mode', 'category', 'name', 'year')
+
+    def filter_genre(self, queryset, name, value):
+        """
+        Id произведений берутся из кэша жанров в памяти процесса,
+        без JOIN с GenreTitle на каждый жанр. Слишком большие
+        множества отбираются в БД одним подзапросом с группировкой.
+        """
+
+        slugs = sorted({slug for slug in value.split(',') if slug})
+        match_all = self.form.cleaned_data.get('genre_mode') == self.GENRE_ALL
+        ids = titles_with_genres(slugs, match_all)
+        if len(ids) <= settings.GENRE_FILTER_MAX_IDS:
+            return queryset.filter(pk__in=ids)
+        links = GenreTitle.objects.filter(genre__slug__in=slugs)
+        if match_all:
+            links = links.values('title').annotate(
+                genres=Count('genre', distinct=True)
+            ).filter(genres=len(slugs))
+        return queryset.filter(pk__in=links.values('title'))
+
+    def filter_category(self, queryset, name, value):
+        # id категории берётся из кэша справочника, без JOIN
+        record = categories.get().by_slug.get(value)
+        if record is None:
+            return queryset.none()
+        return queryset.filter(category_id=record.id)
+
+    def filter_genre_mode(self, queryset, name, value):
+        # Учитывается в filter_genre
+        return queryset
+
+
+class TitleSearchFilter(BaseFilterBackend):
+    """
+    Полнотекстовый поиск произведений по названию и описанию
+    с сортировкой по релевантности и поиском по началу слов.
+    Без индекса FTS5 каждое слово ищется через icontains.
+    """
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        match = build_match_query(text)
+        if match is None:
+            return queryset
+        if not fts_available(queryset.db):
+            for word in text.split():
+                queryset = queryset.filter(
+                    Q(name__icontains=word) | Q(description__icontains=word)
+                )
+            return queryset
+        return queryset.filter(pk__title_fts_match=match).annotate(
+            search_rank=TitleFTSRank(match)
+        ).order_by('search_rank', 'name')
+
+
+class PrefixSearchFilter(BaseFilterBackend):
+    """
+    Поиск без учёта регистра по началу значения.
+    Ищется по индексированному полю view.prefix_search_field,
+    которое хранит значение в нижнем регистре.
+    """
+
+    search_param = 'search'
+
+    def get_search_prefix(self, request):
+        text = request.query_params.get(self.search_param, '')
+        return normalize(text).strip()
+
+    def filter_queryset(self, request, queryset, view):
+        prefix = self.get_search_prefix(request)
+        if not prefix:
+            return queryset
+        field = view.prefix_search_field
+        if connections[queryset.db].vendor == 'sqlite':
+            # LIKE в SQLite не использует индекс по полю с BINARY,
+            # поэтому ищем по диапазону значений
+            return queryset.filter(**{
+                f'{field}__gte': prefix,
+                f'{field}__lt': prefix + MAX_CHAR,
+            })
+        return queryset.filter(**{f'{field}__startswith': prefix})
@@ -0,0 +1,114 @@
+"""
+Повтор POST-запросов с заголовком Idempotency-Key.
+
+Первый ответ на запрос с ключом сохраняется в кэше Django вместе
+с отпечатком тела запроса и при повторе отдаётся без вызова
+обработчика. Пока первый запрос выполняется, повторы с тем же ключом
+ждут его ответа. Выполняющийся запрос отмечается файловой
+блокировкой: add() файлового кэша не атомарен, и два процесса
+могли бы выполнить обработчик одновременно.
+"""
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.v1.response_cache import FileLock
+from api.v1.utils import make_cache_key
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.md5(f'{request.method}:{body}'.encode()).hexdigest()
+
+
+def idempotent_call(request, handler):
+    """
+    Выполняем handler() один раз для ключа из заголовка запроса.
+    Ответы со статусом меньше 500 сохраняются на
+    IDEMPOTENCY_KEY_TIMEOUT секунд, исключения не сохраняются.
+    """
+
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return handler()
+    if len(key) > 255:
+        return Response(
+            {IDEMPOTENCY_HEADER: 'Ключ не длиннее 255 символов.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    user = request.user.pk if request.user.is_authenticated else None
+    cache_key = make_cache_key(
+        'idempotency', request.path, (('key', key), ('user', user))
+    )
+    lock = FileLock(
+        cache_key.replace(':', '-'), settings.IDEMPOTENCY_LOCK_TIMEOUT
+    )
+    fingerprint = request_fingerprint(request)
+
+    stored = cache.get(cache_key)
+    if stored is None and lock.acquire():
+        try:
+            # ответ мог сохраниться между проверкой и блокировкой
+            stored = cache.get(cache_key)
+            if stored is None:
+                response = handler()
+                if response.status_code < 500:
+                    cache.set(
+                        cache_key,
+                        (fingerprint, response.status_code, response.data),
+                        settings.IDEMPOTENCY_KEY_TIMEOUT
+                    )
+                return response
+        finally:
+            lock.release()
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+    while stored is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+        stored = cache.get(cache_key)
+    if stored is None:
+        return Response(
+            {IDEMPOTENCY_HEADER: 'Запрос с этим ключом ещё выполняется.'},
+            status=status.HTTP_409_CONFLICT
+        )
+    stored_fingerprint, status_code, data = stored
+    if stored_fingerprint != fingerprint:
+        return Response(
+            {IDEMPOTENCY_HEADER: 'Ключ уже использован с другим запросом.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(
+        data, status=status_code, headers={REPLAYED_HEADER: 'true'}
+    )
+
+
+def idempotent(view):
+    """
+    Декоратор функции-представления DRF.
+    """
+
+    @functools.wraps(view)
+    def wrapped(request, *args, **kwargs):
+        return idempotent_call(
+            request, functools.partial(view, request, *args, **kwargs)
+        )
+
+    return wrapped
+
+
+class IdempotentCreateMixin:
+    """
+    Idempotency-Key для create во viewset.
+    """
+
+    def create(self, request, *args, **kwargs):
+        handler = functools.partial(super().create, request, *args, **kwargs)
+        return idempotent_call(request, handler)
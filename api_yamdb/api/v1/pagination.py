@@ -0,0 +1,125 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+
+from api.v1.utils import make_cache_key
+
+
+class PubDateCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по дате публикации.
+    Страница выбирается по индексу, без OFFSET и COUNT(*).
+    """
+
+    ordering = ('pub_date', 'id')
+    page_size_query_param = 'limit'
+
+
+class CursorOrLimitOffsetPagination(LimitOffsetPagination):
+    """
+    По умолчанию пагинация limit/offset, как и раньше.
+    Если в запросе передан параметр cursor (в том числе пустой
+    для первой страницы), используется курсорная пагинация.
+    """
+
+    cursor_pagination_class = PubDateCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+
+class CountModeLimitOffsetPagination(LimitOffsetPagination):
+    """
+    Пагинация limit/offset с выбором способа подсчёта через параметр count:
+    exact - точный COUNT(*) на каждый запрос (по умолчанию);
+    estimate - количество из кэша для данного набора фильтров;
+    none - без подсчёта, наличие следующей страницы определяется
+    выборкой limit + 1 записей.
+    """
+
+    count_query_param = 'count'
+    COUNT_EXACT = 'exact'
+    COUNT_ESTIMATE = 'estimate'
+    COUNT_NONE = 'none'
+    COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE)
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode in self.COUNT_MODES:
+            return mode
+        return self.COUNT_EXACT
+
+    def get_count_cache_key(self):
+        """
+        Ключ кэша строится по отсортированным параметрам фильтрации,
+        параметры пагинации в него не входят.
+        """
+
+        skip = (
+            self.limit_query_param,
+            self.offset_query_param,
+            self.count_query_param,
+        )
+        params = (
+            (key, value)
+            for key, values in self.request.query_params.lists()
+            if key not in skip
+            for value in values
+        )
+        return make_cache_key('pagination-count', self.request.path, params)
+
+    def get_count(self, queryset):
+        if self.count_mode != self.COUNT_ESTIMATE:
+            return super().get_count(queryset)
+        key = self.get_count_cache_key()
+        count = cache.get(key)
+        if count is None:
+            count = super().get_count(queryset)
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count_mode = self.get_count_mode(request)
+        if self.count_mode != self.COUNT_NONE:
+            return super().paginate_queryset(queryset, request, view)
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        page = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(page) > self.limit
+        # Ссылки next/previous строятся по count, поэтому
+        # подставляем количество уже просмотренных записей.
+        self.count = self.offset + len(page)
+        return page[:self.limit]
+
+    def get_paginated_response(self, data):
+        if self.count_mode != self.COUNT_NONE:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('has_next', self.has_next),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
@@ -30,7 +30,8 @@ class IsAdminOrReadOnly(permissions.BasePermission):
 class IsAuthorModeratorAdminOrReadOnly(permissions.BasePermission):
     """
     Если автор, или модератор, или админ, можно редактировать,
-    иначе только читать.
+    иначе только читать. Автор сравнивается по author_id,
+    чтобы не загружать пользователя из БД.
     """
 
     def has_object_permission(self, request, view, obj):
@@ -38,7 +39,7 @@ class IsAuthorModeratorAdminOrReadOnly(permissions.BasePermission):
             request.method in permissions.SAFE_METHODS
             or request.user.is_authenticated
             and (
-                request.user == obj.author
+                obj.author_id == request.user.pk
                 or request.user.is_moderator
                 or request.user.is_admin
             )
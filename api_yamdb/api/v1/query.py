@@ -0,0 +1,348 @@
+"""
+Вложенные запросы: произведения с отзывами, комментариями и авторами
+за одно обращение к API.
+
+Запрос описывает дерево узлов, например:
+{"titles": {"ids": [1, 2], "fields": ["id", "name"],
+            "reviews": {"limit": 5, "author": {},
+                        "comments": {"limit": 3, "author": {}}}}}
+Узел загружается одним запросом к БД сразу для всех родителей
+(IN (...)), поэтому число запросов зависит от глубины дерева,
+а не от числа объектов. Отзывы и комментарии отдаются от новых
+к старым, не больше limit на родителя. Пользователи запоминаются
+на время запроса и повторно не загружаются.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from rest_framework import serializers, status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from api.v1.fast_serializers import (
+    category_to_representation,
+    datetime_to_representation,
+    rating_to_representation
+)
+from reviews.models import Comment, Review, Title
+from users.models import User
+
+# не больше 500 параметров в запросе, как и в старых SQLite
+IN_CHUNK_SIZE = 500
+
+
+def chunks(values, size=IN_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class SubquerySQL(RawSQL):
+    """
+    Подзапрос для __in: скобки вокруг него добавит сам поиск,
+    RawSQL со своими скобками превратил бы его в скалярный.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+class ToOne:
+    """
+    Связь с объектом, id которого хранится в поле column родителя.
+    """
+
+    options = ()
+
+    def __init__(self, node, column):
+        self.node = node
+        self.column = column
+
+    def parent_columns(self):
+        return (self.column,)
+
+    def load(self, resolver, plan, rows):
+        keys = {row[self.column] for row in rows} - {None}
+        objects = resolver.load_by_pk(plan.node, keys)
+        found = [objects[key] for key in keys if key in objects]
+        items = dict(zip(
+            (row['pk'] for row in found), resolver.represent(plan, found)
+        ))
+        return [items.get(row[self.column]) for row in rows]
+
+
+class ToMany:
+    """
+    Объекты, поле column которых ссылается на родителя:
+    не больше limit на родителя, от новых к старым.
+    """
+
+    options = ('limit',)
+
+    def __init__(self, node, column):
+        self.node = node
+        self.column = column
+
+    def parent_columns(self):
+        return ()
+
+    def ranked(self, parent_ids, limit):
+        """
+        id первых limit объектов каждого родителя. Нумерация внутри
+        родителя - оконной функцией, поэтому отбор остаётся
+        подзапросом основного запроса.
+        """
+
+        model = self.node.model
+        inner = model.objects.filter(
+            **{f'{self.column}__in': parent_ids}
+        ).annotate(position=Window(
+            expression=RowNumber(),
+            partition_by=(F(self.column),),
+            order_by=(F('pub_date').desc(), F('pk').desc())
+        )).values('pk', 'position')
+        sql, params = inner.query.sql_with_params()
+        pk_column = model._meta.pk.column
+        return SubquerySQL(
+            f'SELECT "{pk_column}" FROM ({sql}) ranked '
+            f'WHERE "position" <= %s',
+            (*params, limit)
+        )
+
+    def load(self, resolver, plan, rows):
+        children = []
+        columns = plan.columns() + (self.column,)
+        for parent_ids in chunks(row['pk'] for row in rows):
+            children.extend(
+                self.node.model.objects.filter(
+                    pk__in=self.ranked(parent_ids, plan.limit)
+                ).order_by('-pub_date', '-pk').values(*columns)
+            )
+        grouped = defaultdict(list)
+        for row, item in zip(children, resolver.represent(plan, children)):
+            grouped[row[self.column]].append(item)
+        return [grouped[row['pk']] for row in rows]
+
+
+class Node:
+    """
+    Модель, доступная во вложенном запросе.
+    fields - поле ответа: (поля модели, функция преобразования),
+    функция None означает, что значение выводится как есть.
+    """
+
+    model = None
+    fields = {}
+    relations = {}
+
+
+class UserNode(Node):
+    # запрос доступен без токена, поэтому об авторе
+    # отдаётся только то, что видно в отзывах и комментариях
+    model = User
+    fields = {
+        'username': (('username',), None),
+    }
+
+
+class CommentNode(Node):
+    model = Comment
+    fields = {
+        'id': (('id',), None),
+        'text': (('text',), None),
+        'pub_date': (('pub_date',), datetime_to_representation),
+    }
+    relations = {
+        'author': ToOne(UserNode, 'author_id'),
+    }
+
+
+class ReviewNode(Node):
+    model = Review
+    fields = {
+        'id': (('id',), None),
+        'text': (('text',), None),
+        'score': (('score',), None),
+        'pub_date': (('pub_date',), datetime_to_representation),
+    }
+    relations = {
+        'author': ToOne(UserNode, 'author_id'),
+        'comments': ToMany(CommentNode, 'review_id'),
+    }
+
+
+class TitleNode(Node):
+    model = Title
+    fields = {
+        'id': (('id',), None),
+        'name': (('name',), None),
+        'year': (('year',), None),
+        'rating': (('rating_sum', 'rating_count'), rating_to_representation),
+        'description': (('description',), None),
+        'category': (
+            ('category__name', 'category__slug'),
+            category_to_representation
+        ),
+    }
+    relations = {
+        'reviews': ToMany(ReviewNode, 'title_id'),
+    }
+
+
+class Plan:
+    """
+    Проверенный узел запроса: поля ответа, связи и их планы.
+    """
+
+    def __init__(self, node, fields, relations, limit=None):
+        self.node = node
+        self.fields = fields
+        self.relations = relations
+        self.limit = limit
+
+    def columns(self):
+        columns = ['pk']
+        for name in self.fields:
+            columns.extend(self.node.fields[name][0])
+        for relation, plan in self.relations.values():
+            columns.extend(relation.parent_columns())
+        return tuple(dict.fromkeys(columns))
+
+
+def parse_plan(node, spec, path, options=()):
+    """
+    Проверяем узел запроса spec и строим по нему план.
+    Ошибки возвращаются с путём до узла, например titles.reviews.
+    """
+
+    if not isinstance(spec, dict):
+        raise serializers.ValidationError({path: 'Ожидается объект.'})
+    unknown = set(spec) - set(node.relations) - {'fields', *options}
+    if unknown:
+        raise serializers.ValidationError({
+            path: f'Неизвестные поля: {", ".join(sorted(unknown))}.'
+        })
+    fields = spec.get('fields', list(node.fields))
+    if (
+        not isinstance(fields, list)
+        or not all(
+            isinstance(name, str) and name in node.fields
+            for name in fields
+        )
+    ):
+        raise serializers.ValidationError({
+            f'{path}.fields': (
+                f'Допустимые поля: {", ".join(node.fields)}.'
+            )
+        })
+    relations = {}
+    for name, relation in node.relations.items():
+        if name in spec:
+            relations[name] = (relation, parse_plan(
+                relation.node, spec[name], f'{path}.{name}',
+                relation.options
+            ))
+    limit = None
+    if 'limit' in options:
+        limit = spec.get('limit', settings.NESTED_QUERY_DEFAULT_LIMIT)
+        if (
+            not isinstance(limit, int)
+            or not 1 <= limit <= settings.NESTED_QUERY_MAX_LIMIT
+        ):
+            raise serializers.ValidationError({
+                f'{path}.limit': (
+                    'Ожидается число от 1 до '
+                    f'{settings.NESTED_QUERY_MAX_LIMIT}.'
+                )
+            })
+    return Plan(node, fields, relations, limit)
+
+
+class QueryResolver:
+    """
+    Выполнение плана с запоминанием загруженных по id объектов
+    на время одного запроса к API.
+    """
+
+    def __init__(self):
+        self.memo = defaultdict(dict)
+
+    def load_by_pk(self, node, keys):
+        """
+        Объекты node по id: недостающие загружаются одним запросом
+        со всеми полями узла, чтобы их можно было переиспользовать.
+        """
+
+        objects = self.memo[node]
+        missing = set(keys) - objects.keys()
+        if missing:
+            plan = Plan(node, list(node.fields), {})
+            for pks in chunks(missing):
+                for row in node.model.objects.filter(
+                    pk__in=pks
+                ).values(*plan.columns()):
+                    objects[row['pk']] = row
+        return objects
+
+    def represent(self, plan, rows):
+        items = []
+        for row in rows:
+            item = {}
+            for name in plan.fields:
+                columns, converter = plan.node.fields[name]
+                if converter is None:
+                    item[name] = row[columns[0]]
+                else:
+                    item[name] = converter(*map(row.__getitem__, columns))
+            items.append(item)
+        if not rows:
+            return items
+        for name, (relation, child) in plan.relations.items():
+            values = relation.load(self, child, rows)
+            for item, value in zip(items, values):
+                item[name] = value
+        return items
+
+    def resolve_titles(self, plan, ids):
+        objects = {}
+        for pks in chunks(ids):
+            for row in Title.objects.filter(
+                pk__in=pks
+            ).values(*plan.columns()):
+                objects[row['pk']] = row
+        rows = [objects[pk] for pk in dict.fromkeys(ids) if pk in objects]
+        return self.represent(plan, rows)
+
+
+class NestedQuerySerializer(serializers.Serializer):
+    """
+    Сериализатор: вложенный запрос, корень - произведения по id.
+    """
+
+    titles = serializers.DictField()
+
+    def validate_titles(self, value):
+        plan = parse_plan(TitleNode, value, 'titles', ('ids',))
+        ids = serializers.ListField(
+            child=serializers.IntegerField(min_value=1),
+            allow_empty=False,
+            max_length=settings.NESTED_QUERY_MAX_IDS
+        ).run_validation(value.get('ids'))
+        return plan, ids
+
+
+@api_view(('POST',))
+def nested_query(request):
+    """
+    Выполняем вложенный запрос и возвращаем дерево объектов.
+    Доступно всем, как и чтение произведений и отзывов.
+    """
+
+    serializer = NestedQuerySerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    plan, ids = serializer.validated_data['titles']
+    titles = QueryResolver().resolve_titles(plan, ids)
+    return Response({'titles': titles}, status=status.HTTP_200_OK)
@@ -0,0 +1,205 @@
+import collections
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+
+from api.v1.utils import make_cache_key
+from reviews import caches
+
+EVENTS = ('hit', 'miss', 'stale')
+# Счётчики ведутся в памяти процесса: запись в общий кэш
+# на каждое попадание стоила бы дороже самого попадания
+STATS = collections.Counter()
+STATS_LOCK = threading.Lock()
+
+
+def record_event(event):
+    with STATS_LOCK:
+        STATS[event] += 1
+
+
+def response_cache_stats():
+    """
+    Количество попаданий, промахов и ответов прежней версии
+    в этом процессе.
+    """
+
+    with STATS_LOCK:
+        return {event: STATS[event] for event in EVENTS}
+
+
+def query_params(request):
+    return [
+        (key, tuple(values)) for key, values in request.query_params.lists()
+    ]
+
+
+class FileLock:
+    """
+    Блокировка между процессами одного сервера: файл, созданный
+    с O_EXCL. Файл старше timeout секунд считается брошенным
+    упавшим процессом и удаляется.
+    """
+
+    def __init__(self, name, timeout=None):
+        self.path = os.path.join(
+            settings.RESPONSE_CACHE_LOCK_DIR, f'{name}.lock'
+        )
+        self.timeout = timeout or settings.RESPONSE_CACHE_LOCK_TIMEOUT
+        self.acquired = False
+
+    def acquire(self):
+        os.makedirs(
+            settings.RESPONSE_CACHE_LOCK_DIR, mode=0o700, exist_ok=True
+        )
+        for _ in range(2):
+            try:
+                os.close(
+                    os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                )
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) < (
+                        self.timeout
+                    ):
+                        return False
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            self.acquired = True
+            return True
+        return False
+
+    def release(self):
+        if not self.acquired:
+            return
+        self.acquired = False
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class CachedResponseMixin:
+    """
+    Кэш готовых ответов list и retrieve для анонимных пользователей.
+    Ключ строится по адресу, параметрам запроса в любом порядке,
+    формату ответа и версиям из get_resource_versions() представления,
+    поэтому при записи достаточно увеличить версию, без поиска ключей.
+    Ответы 404 для несуществующих объектов тоже кэшируются.
+    """
+
+    cached_statuses = (200, 404)
+
+    def get_response_cache_key(self, request):
+        versions, _ = caches.get_versions(
+            (caches.data_version, *self.get_resource_versions())
+        )
+        return make_cache_key(
+            'response',
+            (
+                request.get_host(),
+                request.path,
+                request.accepted_media_type,
+                versions
+            ),
+            query_params(request)
+        )
+
+    def is_hot_request(self, request):
+        """
+        Запросы, которые часто приходят одновременно: при промахе
+        ответ строит один процесс, остальные получают прежнюю версию
+        ответа или ждут его.
+        """
+
+        return False
+
+    def get_stale_cache_key(self, request):
+        return make_cache_key(
+            'response-stale',
+            (request.get_host(), request.path, request.accepted_media_type),
+            query_params(request)
+        )
+
+    def from_cache(self, cached, event):
+        record_event(event)
+        status_code, content_type, content = cached
+        response = HttpResponse(
+            content, status=status_code, content_type=content_type
+        )
+        response['X-Cache'] = event.upper()
+        return response
+
+    def fill_cache(self, keys, handler, request, *args, **kwargs):
+        """
+        Строим ответ, сразу отрисовываем его и сохраняем под ключами
+        keys (ключ, время жизни).
+        """
+
+        record_event('miss')
+        try:
+            response = handler(request, *args, **kwargs)
+        except Http404 as exc:
+            response = self.handle_exception(exc)
+        response = self.finalize_response(request, response, *args, **kwargs)
+        response.render()
+        if response.status_code in self.cached_statuses:
+            cached = (
+                response.status_code, response['Content-Type'],
+                response.content
+            )
+            for key, timeout in keys:
+                cache.set(key, cached, timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if not timeout or request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            return self.from_cache(cached, 'hit')
+        if not self.is_hot_request(request):
+            return self.fill_cache(
+                ((key, timeout),), handler, request, *args, **kwargs
+            )
+
+        stale_key = self.get_stale_cache_key(request)
+        keys = ((key, timeout), (stale_key, settings.STALE_RESPONSE_TIMEOUT))
+        lock = FileLock(key.replace(':', '-'))
+        if lock.acquire():
+            try:
+                # ответ мог появиться, пока блокировку держал другой процесс
+                cached = cache.get(key)
+                if cached is not None:
+                    return self.from_cache(cached, 'hit')
+                return self.fill_cache(keys, handler, request, *args, **kwargs)
+            finally:
+                lock.release()
+        stale = cache.get(stale_key)
+        if stale is not None:
+            return self.from_cache(stale, 'stale')
+        deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            cached = cache.get(key)
+            if cached is not None:
+                return self.from_cache(cached, 'hit')
+        # Не дождались другого процесса, строим ответ сами
+        return self.fill_cache(keys, handler, request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -1,12 +1,54 @@
 from django.conf import settings
-
+from django.db import connection, transaction
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
 
-from reviews.models import Category, Comment, Genre, Review, Title
+from reviews import caches, search
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
 from users.models import User
 
 
+class SparseFieldsMixin:
+    """
+    При чтении поля ответа ограничиваются параметрами запроса
+    fields= и exclude= (имена полей через запятую).
+    """
+
+    fields_query_param = 'fields'
+    exclude_query_param = 'exclude'
+
+    @classmethod
+    def get_sparse_fields(cls, request):
+        """
+        Возвращаем кортеж оставшихся полей или None,
+        если ограничений в запросе нет.
+        """
+
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        only = request.query_params.get(cls.fields_query_param)
+        exclude = request.query_params.get(cls.exclude_query_param)
+        if not only and not exclude:
+            return None
+        fields = cls.Meta.fields
+        if only:
+            only = set(only.split(','))
+            fields = tuple(name for name in fields if name in only)
+        if exclude:
+            exclude = set(exclude.split(','))
+            fields = tuple(name for name in fields if name not in exclude)
+        return fields
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.get_sparse_fields(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class SignupSerializer(serializers.Serializer):
     """
     Сериализатор: регистрация пользователя.
@@ -36,7 +78,39 @@ class TokenSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=150)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class BatchItemSerializer(serializers.Serializer):
+    """
+    Сериализатор: подзапрос пакетного запроса.
+    """
+
+    method = serializers.ChoiceField(
+        choices=('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+    )
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(
+        child=serializers.CharField(max_length=2000), required=False
+    )
+
+
+class BatchSerializer(serializers.Serializer):
+    """
+    Сериализатор: пакет подзапросов, atomic - в одной транзакции.
+    """
+
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        max_length = settings.BATCH_MAX_REQUESTS
+        if len(value) > max_length:
+            raise serializers.ValidationError(
+                f'Не больше {max_length} подзапросов за запрос.'
+            )
+        return value
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор модели User.
     """
@@ -53,7 +127,7 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Класс для сериализации данных Comment.
     """
@@ -68,7 +142,7 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ('id', 'text', 'author', 'pub_date')
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Класс для сериализации Review.
     Проверяет с использованием валидации,
@@ -89,14 +163,13 @@ class ReviewSerializer(serializers.ModelSerializer):
         request = self.context['request']
         if request.method != 'POST':
             return data
-        author = request.user
-        title_id = self.context['request'].parser_context['kwargs']['title_id']
-        if Review.objects.filter(title_id=title_id, author=author).exists():
+        title = self.context['view'].get_title()
+        if title.reviews.filter(author_id=request.user.pk).exists():
             raise ValidationError('Нельзя добавить более одного отзыва')
         return data
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Серриализация модели Category.
     """
@@ -106,7 +179,7 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ('name', 'slug')
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Серриализация модели Genre.
     """
@@ -116,17 +189,180 @@ class GenreSerializer(serializers.ModelSerializer):
         fields = ('name', 'slug')
 
 
+class CatalogSlugRelatedField(serializers.SlugRelatedField):
+    """
+    Поле по слагу категории или жанра, которое ищет запись
+    в кэше справочника в памяти процесса, а не в БД.
+    """
+
+    def __init__(self, catalog, **kwargs):
+        self.catalog = catalog
+        kwargs.setdefault('slug_field', 'slug')
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        catalog = self.catalog.get()
+        record = catalog.by_slug.get(data)
+        if record is None:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+        return catalog.instance(record)
+
+
+class TitleBulkSerializer(serializers.ListSerializer):
+    """
+    Создание и изменение списка произведений в одной транзакции.
+    Элемент с id изменяет существующее произведение, без id создаёт
+    новое. Слаги жанров и категорий берутся из кэша справочников,
+    произведения и связи с жанрами пишутся bulk_create/bulk_update.
+    Ошибки возвращаются списком по элементам.
+    """
+
+    default_error_messages = {
+        'max_length': 'Не больше {max_length} произведений за запрос.',
+    }
+
+    def to_internal_value(self, data):
+        max_length = settings.TITLE_BULK_MAX_ITEMS
+        if isinstance(data, list) and len(data) > max_length:
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.error_messages[
+                    'max_length'
+                ].format(max_length=max_length)]
+            })
+        try:
+            items = super().to_internal_value(data)
+            errors = [{} for _ in items]
+        except ValidationError as exc:
+            if not isinstance(exc.detail, list):
+                raise
+            items, errors = None, exc.detail
+        ids = self.get_ids(data, errors)
+        existing = set(Title.objects.filter(
+            pk__in=[pk for pk in ids if pk is not None]
+        ).values_list('pk', flat=True))
+        for index, pk in enumerate(ids):
+            if pk is not None and pk not in existing:
+                errors[index] = {
+                    **errors[index], 'id': [f'Произведение {pk} не найдено.']
+                }
+        if items is None or any(errors):
+            raise ValidationError(errors)
+        changed = [pk for pk in ids if pk is not None]
+        if len(set(changed)) != len(changed):
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Произведение можно изменить только один раз за запрос.'
+                ]
+            })
+        for item, pk in zip(items, ids):
+            item['id'] = pk
+        return items
+
+    @staticmethod
+    def get_ids(data, errors):
+        """
+        id элементов, проверенные как IntegerField. Ошибки
+        добавляются в errors, у таких элементов id - None.
+        """
+
+        id_field = serializers.IntegerField(min_value=1)
+        ids = []
+        for index, item in enumerate(data):
+            pk = item.get('id') if isinstance(item, dict) else None
+            if pk is not None:
+                try:
+                    pk = id_field.run_validation(pk)
+                except ValidationError as exc:
+                    errors[index] = {**errors[index], 'id': exc.detail}
+                    pk = None
+            ids.append(pk)
+        return ids
+
+    @staticmethod
+    def insert_titles(titles):
+        """
+        Добавляем новые произведения и получаем их id.
+        """
+
+        if connection.features.can_return_ids_from_bulk_insert:
+            Title.objects.bulk_create(titles)
+        elif connection.vendor == 'sqlite':
+            Title.objects.bulk_create(titles)
+            # SQLite не возвращает id из bulk_create, но допускает
+            # только одну пишущую транзакцию, и последние id в ней
+            # принадлежат только что созданным строкам
+            ids = Title.objects.order_by('-pk').values_list(
+                'pk', flat=True
+            )[:len(titles)]
+            for title, pk in zip(titles, sorted(ids)):
+                title.pk = pk
+        else:
+            # в других БД вставки разных транзакций чередуются,
+            # и последние id могут быть чужими
+            for title in titles:
+                title.save(force_insert=True)
+
+    def create(self, validated_data):
+        titles = []
+        for item in validated_data:
+            title = Title(
+                id=item['id'],
+                name=item['name'],
+                year=item['year'],
+                description=item.get('description', ''),
+                category=item['category']
+            )
+            titles.append(title)
+        new = [title for title in titles if title.pk is None]
+        changed = [title for title in titles if title.pk is not None]
+        with transaction.atomic():
+            if new:
+                self.insert_titles(new)
+            if changed:
+                Title.objects.bulk_update(
+                    changed,
+                    ('name', 'year', 'description', 'category')
+                )
+                GenreTitle.objects.filter(title__in=changed).delete()
+            GenreTitle.objects.bulk_create(
+                GenreTitle(title_id=title.pk, genre_id=genre.pk)
+                for title, item in zip(titles, validated_data)
+                for genre in {genre.pk: genre for genre in item['genre']}
+                .values()
+            )
+            search.index_titles(titles)
+            # bulk_create и bulk_update не отправляют сигналы
+            for versioned in (
+                caches.genre_titles, caches.titles_version, caches.data_version
+            ):
+                versioned.invalidate()
+        return titles
+
+    def to_representation(self, data):
+        titles = {
+            title.pk: title
+            for title in Title.objects.filter(
+                pk__in=[title.pk for title in data]
+            ).select_related('category').prefetch_related('genre')
+        }
+        return super().to_representation(
+            [titles[title.pk] for title in data]
+        )
+
+
 class TitleWriteSerializer(serializers.ModelSerializer):
     """
     Серриализация модели Title для записи.
     """
 
-    genre = serializers.SlugRelatedField(
-        slug_field='slug', many=True,
+    genre = CatalogSlugRelatedField(
+        caches.genres, many=True,
         queryset=Genre.objects.all()
     )
-    category = serializers.SlugRelatedField(
-        slug_field='slug',
+    category = CatalogSlugRelatedField(
+        caches.categories,
         queryset=Category.objects.all()
     )
 
@@ -140,9 +376,10 @@ class TitleWriteSerializer(serializers.ModelSerializer):
             'genre',
             'category'
         )
+        list_serializer_class = TitleBulkSerializer
 
 
-class TitleReadSerializer(serializers.ModelSerializer):
+class TitleReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Серриализация модели Title для чтения.
     """
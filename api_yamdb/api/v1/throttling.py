@@ -0,0 +1,141 @@
+import functools
+import hashlib
+import time
+from collections.abc import Mapping
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Ограничение частоты запросов скользящим окном. Хранятся только
+    счётчики текущего и предыдущего окна; число запросов за последние
+    duration секунд оценивается как сумма текущего счётчика и доли
+    предыдущего, пропорциональной непрошедшей части окна.
+    Частота задаётся в DEFAULT_THROTTLE_RATES по scope, как в DRF.
+    Оставшаяся квота записывается в запрос для заголовков X-RateLimit-*.
+    """
+
+    scope = None
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        self.num_requests, self.duration = SimpleRateThrottle.parse_rate(
+            self, rate
+        )
+
+    def get_ident_value(self, request):
+        raise NotImplementedError
+
+    def get_cache_key(self, request, view):
+        ident = self.get_ident_value(request)
+        if not ident:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.num_requests is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        now = time.time()
+        window = int(now // self.duration)
+        current_key = f'{key}:{window}'
+        previous_key = f'{key}:{window - 1}'
+        counts = cache.get_many((current_key, previous_key))
+        self.elapsed = now % self.duration
+        self.previous = counts.get(previous_key, 0)
+        self.current = counts.get(current_key, 0)
+        weight = 1 - self.elapsed / self.duration
+        allowed = self.previous * weight + self.current < self.num_requests
+        if allowed:
+            self.current += 1
+            if not cache.add(current_key, 1, timeout=2 * self.duration):
+                self.current = cache.incr(current_key)
+        self.record_quota(request, weight)
+        return allowed
+
+    def record_quota(self, request, weight):
+        remaining = max(
+            0, int(self.num_requests - self.previous * weight - self.current)
+        )
+        quota = (remaining, self.num_requests, self.duration - self.elapsed)
+        quotas = getattr(request._request, 'rate_limit_quotas', [])
+        request._request.rate_limit_quotas = quotas + [quota]
+
+    def wait(self):
+        """
+        Через сколько секунд оценка опустится ниже лимита.
+        """
+
+        if self.current >= self.num_requests or not self.previous:
+            return self.duration - self.elapsed
+        # доля предыдущего окна, которая должна уйти из оценки
+        excess = self.previous + self.current - self.num_requests + 1
+        needed = excess * self.duration / self.previous
+        return max(0.0, needed - self.elapsed)
+
+
+class IPThrottle(SlidingWindowThrottle):
+    def get_ident_value(self, request):
+        return self.get_ident(request)
+
+
+class DataFieldThrottle(SlidingWindowThrottle):
+    """
+    Ключ - хеш значения поля field из тела запроса
+    без учёта регистра. Тело не объект (например, JSON-массив)
+    не ограничивается: его отклонит валидация сериализатора.
+    """
+
+    field = None
+
+    def get_ident_value(self, request):
+        if not isinstance(request.data, Mapping):
+            return None
+        value = request.data.get(self.field)
+        if not isinstance(value, str):
+            return None
+        return hashlib.md5(value.strip().casefold().encode()).hexdigest()
+
+
+class SignupIPThrottle(IPThrottle):
+    scope = 'signup_ip'
+
+
+class SignupEmailThrottle(DataFieldThrottle):
+    scope = 'signup_email'
+    field = 'email'
+
+
+class TokenIPThrottle(IPThrottle):
+    scope = 'token_ip'
+
+
+class TokenUsernameThrottle(DataFieldThrottle):
+    scope = 'token_username'
+    field = 'username'
+
+
+def rate_limit_headers(view):
+    """
+    Заголовки X-RateLimit-Limit, X-RateLimit-Remaining
+    и X-RateLimit-Reset по самому строгому из ограничений запроса.
+    """
+
+    @functools.wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        quotas = getattr(request, 'rate_limit_quotas', None)
+        if quotas:
+            remaining, limit, reset = min(quotas)
+            response['X-RateLimit-Limit'] = limit
+            response['X-RateLimit-Remaining'] = remaining
+            response['X-RateLimit-Reset'] = int(reset + 0.5)
+        return response
+
+    return wrapped
@@ -1,6 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
+from api.v1.batch import batch
+from api.v1.query import nested_query
 from api.v1.views import (
     CategoryViewSet,
     CommentViewSet,
@@ -35,5 +37,7 @@ auth_urlpatterns = [
 
 urlpatterns = [
     path('auth/', include(auth_urlpatterns)),
+    path('batch/', batch, name='batch'),
+    path('query/', nested_query, name='query'),
     path('', include(router_v1.urls)),
 ]
@@ -0,0 +1,11 @@
+import hashlib
+
+
+def make_cache_key(prefix, path, params):
+    """
+    Ключ кэша по пути запроса и набору параметров
+    независимо от их порядка.
+    """
+
+    digest = hashlib.md5(repr((path, sorted(params))).encode()).hexdigest()
+    return f'{prefix}:{digest}'
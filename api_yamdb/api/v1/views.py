@@ -1,26 +1,38 @@
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.db import IntegrityError
-from django.db.models import Avg
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import status, mixins, viewsets, filters
-from rest_framework.decorators import api_view
+from rest_framework import status, mixins, viewsets
+from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.permissions import (
     IsAuthenticated,
     IsAuthenticatedOrReadOnly
 )
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework_simplejwt.tokens import AccessToken
 
-from api.v1.filters import TitleFilter
+from api.v1.fast_serializers import (
+    CommentValuesSerializer,
+    ReviewValuesSerializer,
+    TitleValuesSerializer
+)
+from api.v1.filters import PrefixSearchFilter, TitleFilter, TitleSearchFilter
+from api.v1.idempotency import IdempotentCreateMixin, idempotent
+from api.v1.pagination import (
+    CountModeLimitOffsetPagination,
+    CursorOrLimitOffsetPagination
+)
 from api.v1.permissions import (
     IsAdmin,
     IsAdminOrReadOnly,
     IsAuthorModeratorAdminOrReadOnly
 )
+from api.v1.response_cache import CachedResponseMixin
 from api.v1.serializers import (
     CategorySerializer,
     GenreSerializer,
@@ -31,17 +43,33 @@ from api.v1.serializers import (
     SignupSerializer,
     UserSerializer,
     TokenSerializer,
+    SparseFieldsMixin,
+)
+from api.v1.throttling import (
+    SignupEmailThrottle,
+    SignupIPThrottle,
+    TokenIPThrottle,
+    TokenUsernameThrottle,
+    rate_limit_headers
 )
+from api.v1.utils import make_cache_key
+from reviews import caches
 from reviews.models import (
     Category,
     Genre,
+    GenreTitle,
     Title,
     Review,
 )
+from users import outbox
 from users.models import User
+from users.tokens import access_token_for
 
 
+@rate_limit_headers
 @api_view(('POST',))
+@throttle_classes((SignupIPThrottle, SignupEmailThrottle))
+@idempotent
 def signup(request):
     """
     Регистрация пользователя с отправкой кода подтверждения на почту.
@@ -52,28 +80,29 @@ def signup(request):
     username = serializer.validated_data['username']
     email = serializer.validated_data['email']
     try:
-        user, _ = User.objects.get_or_create(
-            username=username,
-            email=email,
-        )
+        with transaction.atomic():
+            user, _ = User.objects.get_or_create(
+                username=username,
+                email=email,
+            )
+            # Письмо отправит команда send_emails
+            confirmation_code = default_token_generator.make_token(user)
+            outbox.enqueue(
+                subject='confirmation_code',
+                body=f'{username} - {confirmation_code}',
+                recipient=email,
+            )
     except IntegrityError:
         return Response(
             'Такой пары username-email нет в базе данных',
             status=status.HTTP_400_BAD_REQUEST
         )
-
-    confirmation_code = default_token_generator.make_token(user)
-    send_mail(
-        subject='confirmation_code',
-        message=f'{username} - {confirmation_code}',
-        from_email=settings.FROM,
-        recipient_list=[email],
-        fail_silently=False,
-    )
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@rate_limit_headers
 @api_view(('POST',))
+@throttle_classes((TokenIPThrottle, TokenUsernameThrottle))
 def get_token(request):
     """
     Получение токена авторизации.
@@ -89,14 +118,55 @@ def get_token(request):
             'Передан некорректный код подтверждения',
             status=status.HTTP_400_BAD_REQUEST
         )
-    token = AccessToken.for_user(user)
+    token = access_token_for(user)
     return Response(
         {'token': str(token)},
         status=status.HTTP_200_OK
     )
 
 
-class UsersViewSet(viewsets.ModelViewSet):
+class SparseFieldsViewMixin:
+    """
+    Загружаем из БД только то, что нужно для полей,
+    запрошенных через fields= и exclude=.
+    sparse_fields_columns - поля модели для каждого поля ответа
+    (по умолчанию одноимённое поле модели),
+    sparse_fields_required - поля модели, нужные всегда,
+    select_related_fields и prefetch_related_fields - связи,
+    которые загружаются только для запрошенных полей.
+    """
+
+    sparse_fields_columns = {}
+    sparse_fields_required = ('pk',)
+    select_related_fields = {}
+    prefetch_related_fields = {}
+
+    def get_sparse_fields(self):
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsMixin):
+            return None
+        return serializer_class.get_sparse_fields(self.request)
+
+    def sparse_queryset(self, queryset):
+        fields = self.get_sparse_fields()
+        for name, lookup in self.select_related_fields.items():
+            if fields is None or name in fields:
+                queryset = queryset.select_related(lookup)
+        for name, lookup in self.prefetch_related_fields.items():
+            if fields is None or name in fields:
+                queryset = queryset.prefetch_related(lookup)
+        if fields is None:
+            return queryset
+        columns = list(self.sparse_fields_required)
+        for name in fields:
+            columns.extend(self.sparse_fields_columns.get(name, (name,)))
+        return queryset.only(*columns)
+
+    def get_queryset(self):
+        return self.sparse_queryset(super().get_queryset())
+
+
+class UsersViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     """
     Работа с информацией о пользователях.
     """
@@ -104,7 +174,8 @@ class UsersViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (IsAdmin,)
-    search_fields = ('username',)
+    filter_backends = (PrefixSearchFilter,)
+    prefix_search_field = 'normalized_username'
     lookup_field = 'username'
 
     @action(
@@ -115,6 +186,8 @@ class UsersViewSet(viewsets.ModelViewSet):
     )
     def me(self, request):
         instance = request.user
+        if not isinstance(instance, User):
+            instance = get_object_or_404(User, pk=instance.pk)
         if request.method == 'GET':
             serializer = self.get_serializer(instance)
             return Response(serializer.data)
@@ -128,53 +201,195 @@ class UsersViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ValuesListMixin:
+    """
+    Быстрый путь для списков только для чтения: при включённой
+    настройке FAST_LIST_SERIALIZATION ответ строится из .values()
+    сериализатором values_serializer_class.
+    Используется вместе с SparseFieldsViewMixin.
+    """
+
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if (
+            not settings.FAST_LIST_SERIALIZATION
+            or self.values_serializer_class is None
+        ):
+            return super().list(request, *args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            fields = self.get_serializer_class().Meta.fields
+        serializer = self.values_serializer_class(fields)
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer.to_representation(page)
+            )
+        return Response(serializer.to_representation(queryset))
+
+
+class ConditionalListMixin:
+    """
+    Условный GET для списка. ETag и Last-Modified строятся
+    по счётчикам версий из get_resource_versions() представления,
+    и при совпадении с If-None-Match или If-Modified-Since ответ 304
+    возвращается без запросов к БД и сериализации.
+    """
+
+    def get_list_validators(self):
+        versions, last_modified = caches.get_versions(
+            (caches.data_version, *self.get_resource_versions())
+        )
+        etag = make_cache_key('list', self.request.get_full_path(), (
+            ('versions', versions),
+            ('media', self.request.accepted_media_type),
+        ))
+        return quote_etag(etag), last_modified
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_list_validators()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class NestedParentMixin:
+    """
+    Родительские объекты вложенных маршрутов (title_id, review_id)
+    загружаются один раз за запрос и переиспользуются при построении
+    queryset, валидации сериализатора и создании объекта.
+    """
+
+    def get_title(self):
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(
+                Title,
+                pk=self.kwargs['title_id']
+            )
+        return self._title
+
+    def get_review(self):
+        """
+        Отзыв и его принадлежность произведению проверяются
+        одним запросом, произведение загружается вместе с ним.
+        """
+
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review.objects.select_related('title'),
+                title_id=self.kwargs['title_id'],
+                pk=self.kwargs['review_id']
+            )
+            self._title = self._review.title
+        return self._review
+
+    def get_author_fields(self):
+        """
+        Автор новой записи. Пользователь из токена с ролью
+        не загружается из БД, поэтому для него передаётся только id.
+        """
+
+        user = self.request.user
+        if isinstance(user, User):
+            return {'author': user}
+        return {'author_id': user.pk}
+
+
+class ReviewViewSet(
+    IdempotentCreateMixin,
+    ConditionalListMixin,
+    CachedResponseMixin,
+    ValuesListMixin,
+    SparseFieldsViewMixin,
+    NestedParentMixin,
+    viewsets.ModelViewSet
+):
     """
     Работа с информацией обзора на произведение.
     """
 
     serializer_class = ReviewSerializer
+    values_serializer_class = ReviewValuesSerializer
+    pagination_class = CursorOrLimitOffsetPagination
     permission_classes = (
         IsAuthorModeratorAdminOrReadOnly,
         IsAuthenticatedOrReadOnly
     )
+    sparse_fields_columns = {'author': ('author__username',)}
+    sparse_fields_required = ('pk', 'title')
+    select_related_fields = {'author': 'author'}
+
+    def get_resource_versions(self):
+        return (
+            caches.title_reviews_version(int(self.kwargs['title_id'])),
+            caches.users_version
+        )
 
-    def get_title(self):
-        return get_object_or_404(
-            Title,
-            pk=self.kwargs['title_id']
+    def is_hot_request(self, request):
+        # первая страница отзывов
+        params = request.query_params
+        return (
+            self.action == 'list'
+            and params.get('offset', '0') in ('', '0')
+            and not params.get('cursor')
         )
 
     def get_queryset(self):
-        return self.get_title().reviews.all()
+        return self.sparse_queryset(
+            self.get_title().reviews.order_by('pub_date', 'id')
+        )
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, title=self.get_title())
+        serializer.save(title=self.get_title(), **self.get_author_fields())
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(
+    IdempotentCreateMixin,
+    CachedResponseMixin,
+    ValuesListMixin,
+    SparseFieldsViewMixin,
+    NestedParentMixin,
+    viewsets.ModelViewSet
+):
     """
     Работа с информацией комментария на обзор произведения.
     """
 
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
+    pagination_class = CursorOrLimitOffsetPagination
     permission_classes = (
         IsAuthorModeratorAdminOrReadOnly,
         IsAuthenticatedOrReadOnly
     )
 
-    def get_review(self):
-        return get_object_or_404(
-            Review,
-            title_id=self.kwargs['title_id'],
-            pk=self.kwargs['review_id']
+    sparse_fields_columns = {'author': ('author__username',)}
+    sparse_fields_required = ('pk', 'review')
+    select_related_fields = {'author': 'author'}
+
+    def get_resource_versions(self):
+        return (
+            caches.review_comments_version(int(self.kwargs['review_id'])),
+            caches.users_version
         )
 
     def get_queryset(self):
-        return self.get_review().comments.all()
+        return self.sparse_queryset(
+            self.get_review().comments.order_by('pub_date', 'id')
+        )
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, review=self.get_review())
+        serializer.save(
+            review=self.get_review(), **self.get_author_fields()
+        )
 
 
 class CreateRetrieveDeleteViewSet(
@@ -186,42 +401,100 @@ class CreateRetrieveDeleteViewSet(
     pass
 
 
-class CategoryViewSet(CreateRetrieveDeleteViewSet):
+class CatalogListMixin:
+    """
+    Список категорий или жанров из кэша справочника в памяти процесса,
+    поиск по началу названия выполняется там же.
+    """
+
+    catalog = None
+
+    def get_resource_versions(self):
+        return (self.catalog.counter,)
+
+    def list(self, request, *args, **kwargs):
+        prefix = PrefixSearchFilter().get_search_prefix(request)
+        records = self.catalog.get().search(prefix)
+        page = self.paginate_queryset(records)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(records, many=True)
+        return Response(serializer.data)
+
+
+class CategoryViewSet(
+    ConditionalListMixin,
+    CatalogListMixin,
+    SparseFieldsViewMixin,
+    CreateRetrieveDeleteViewSet
+):
     """
     Работа со списком категорий.
     """
 
     queryset = Category.objects.order_by('slug')
+    catalog = caches.categories
     serializer_class = CategorySerializer
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('name',)
+    filter_backends = (PrefixSearchFilter,)
+    prefix_search_field = 'normalized_name'
     lookup_field = 'slug'
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class GenreViewSet(CreateRetrieveDeleteViewSet):
+class GenreViewSet(
+    ConditionalListMixin,
+    CatalogListMixin,
+    SparseFieldsViewMixin,
+    CreateRetrieveDeleteViewSet
+):
     """
     Работа со списком жанров.
     """
 
     queryset = Genre.objects.order_by('slug')
+    catalog = caches.genres
     serializer_class = GenreSerializer
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('name',)
+    filter_backends = (PrefixSearchFilter,)
+    prefix_search_field = 'normalized_name'
     lookup_field = 'slug'
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(
+    ConditionalListMixin,
+    CachedResponseMixin,
+    ValuesListMixin,
+    SparseFieldsViewMixin,
+    viewsets.ModelViewSet
+):
     """
     Работа со списком произведений.
     """
 
-    queryset = Title.objects.prefetch_related('genre').select_related(
-        'category').annotate(rating=Avg('reviews__score')).order_by('name')
-    filter_backends = (DjangoFilterBackend,)
+    queryset = Title.objects.order_by('name')
+    values_serializer_class = TitleValuesSerializer
+    filter_backends = (DjangoFilterBackend, TitleSearchFilter)
     filterset_class = TitleFilter
+    pagination_class = CountModeLimitOffsetPagination
     permission_classes = (IsAdminOrReadOnly,)
+    sparse_fields_columns = {
+        'rating': ('rating_sum', 'rating_count'),
+        'genre': (),
+        'category': ('category__name', 'category__slug'),
+    }
+    select_related_fields = {'category': 'category'}
+    prefetch_related_fields = {'genre': 'genre'}
+
+    def get_resource_versions(self):
+        return (
+            caches.titles_version,
+            caches.genres.counter,
+            caches.categories.counter
+        )
+
+    def is_hot_request(self, request):
+        return self.action == 'retrieve'
 
     def get_serializer_class(self):
         """
@@ -231,3 +504,84 @@ class TitleViewSet(viewsets.ModelViewSet):
         if self.action in ('list', 'retrieve'):
             return TitleReadSerializer
         return TitleWriteSerializer
+
+    def get_facets_cache_key(self):
+        """
+        Ключ кэша по параметрам фильтрации и поиска,
+        слаги жанров сортируются.
+        """
+
+        names = {*TitleFilter.base_filters, TitleSearchFilter.search_param}
+        params = []
+        for key, values in self.request.query_params.lists():
+            if key not in names:
+                continue
+            for value in values:
+                if key == 'genre':
+                    value = ','.join(sorted(set(value.split(','))))
+                params.append((key, value))
+        return make_cache_key('title-facets', self.request.path, params)
+
+    @staticmethod
+    def catalog_counts(catalog, counts):
+        """
+        Названия и слаги для счётчиков по id берутся из кэша справочника.
+        """
+
+        by_id = catalog.get().by_id
+        data = []
+        for pk, count in counts:
+            record = by_id.get(pk)
+            data.append({
+                'slug': record.slug if record else None,
+                'name': record.name if record else None,
+                'count': count,
+            })
+        return sorted(data, key=lambda item: item['slug'] or '')
+
+    @action(detail=False, methods=('post',), url_path='bulk')
+    def bulk(self, request):
+        """
+        Создание и изменение произведений списком в одной транзакции.
+        """
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=('get',), url_path='facets')
+    def facets(self, request):
+        """
+        Количество произведений по жанрам, категориям и годам
+        для текущих фильтров, тремя агрегирующими запросами.
+        """
+
+        timeout = settings.TITLE_FACETS_CACHE_TIMEOUT
+        key = self.get_facets_cache_key()
+        if timeout:
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+        ids = self.filter_queryset(Title.objects.all()).order_by().values('pk')
+        titles = Title.objects.filter(pk__in=ids)
+        genres = GenreTitle.objects.filter(title__in=ids).values_list(
+            'genre_id'
+        ).annotate(count=Count('title', distinct=True)).order_by()
+        categories = titles.values_list('category_id').annotate(
+            count=Count('pk')
+        ).order_by()
+        years = titles.values_list('year').annotate(
+            count=Count('pk')
+        ).order_by('year')
+        data = {
+            'genre': self.catalog_counts(caches.genres, genres),
+            'category': self.catalog_counts(caches.categories, categories),
+            'year': [
+                {'year': year, 'count': count} for year, count in years
+            ],
+        }
+        data['count'] = sum(item['count'] for item in data['category'])
+        if timeout:
+            cache.set(key, data, timeout)
+        return Response(data)
@@ -64,6 +64,25 @@ DATABASES = {
     }
 }
 
+# Кэш, общий для всех процессов сервера: в нём хранятся версии
+# справочников, ответов и токенов, кэш ответов, счётчики ограничений
+# и ключи идемпотентности. Файлового кэша хватает для одного сервера,
+# в продакшене и для нескольких серверов нужен Redis или Memcached.
+# Кэш в памяти процесса (LocMemCache) не подходит: другие процессы
+# не увидят изменений.
+# Каталог файлового кэша и блокировок доступен только владельцу
+# проекта, а не всем пользователям, как /tmp: из кэша читаются pickle.
+CACHE_DIR = os.environ.get(
+    'API_YAMDB_CACHE_DIR', os.path.join(BASE_DIR, 'cache')
+)
+CACHES = {
+    'default': {
+        'BACKEND': 'api.cache.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'default'),
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_INTERVAL': 60},
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -81,10 +100,18 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.v1.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 5,
+    # Регистрация и получение токена: с одного IP и для одного
+    # email или username
+    'DEFAULT_THROTTLE_RATES': {
+        'signup_ip': '20/hour',
+        'signup_email': '5/hour',
+        'token_ip': '30/hour',
+        'token_username': '10/hour',
+    },
 }
 
 SIMPLE_JWT = {
@@ -115,3 +142,66 @@ UNUSED_USERNAME = 'me'
 FROM = 'noreply@noreply.com'
 
 CONFINES_TEXT = 10
+
+# Время жизни кэшированного количества записей при пагинации (count=estimate)
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+# Время жизни кэша счётчиков /titles/facets/, 0 - без кэша
+TITLE_FACETS_CACHE_TIMEOUT = 30
+
+# Наибольшее число id произведений, передаваемых в фильтр по жанрам списком,
+# для больших множеств используется подзапрос
+GENRE_FILTER_MAX_IDS = 10000
+
+# Наибольшее число произведений в POST /api/v1/titles/bulk/
+TITLE_BULK_MAX_ITEMS = 1000
+
+# Построение списков произведений, отзывов и комментариев из .values()
+FAST_LIST_SERIALIZATION = False
+
+# Время жизни кэша ответов для анонимных GET-запросов, 0 - без кэша
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Прежняя версия популярных ответов отдаётся, пока новую строит
+# другой процесс; остальные ждут не дольше RESPONSE_CACHE_LOCK_WAIT секунд
+STALE_RESPONSE_TIMEOUT = 3600
+RESPONSE_CACHE_LOCK_WAIT = 0.5
+# Блокировки построения ответа (файлы) и время, после которого
+# блокировка упавшего процесса снимается
+RESPONSE_CACHE_LOCK_DIR = os.path.join(CACHE_DIR, 'locks')
+RESPONSE_CACHE_LOCK_TIMEOUT = 30
+
+# Количество проверенных JWT в LRU-кэше процесса, 0 - без кэша
+JWT_VERIFIED_TOKEN_CACHE_SIZE = 4096
+
+# Время хранения версии токенов пользователя в кэше: дольше этого
+# не принимаются токены после изменений в обход сигналов (update())
+TOKEN_VERSION_CACHE_TIMEOUT = 60
+
+# Очередь писем: размер пачки, число попыток, задержка перед повтором
+# (удваивается с каждой попыткой, но не больше максимальной)
+# и время, на которое отправитель забирает пачку, в секундах
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_MAX_RETRY_DELAY = 3600
+EMAIL_OUTBOX_LEASE = 300
+
+# Ответы на POST с Idempotency-Key хранятся IDEMPOTENCY_KEY_TIMEOUT секунд;
+# повтор ждёт выполняющийся запрос не дольше IDEMPOTENCY_WAIT секунд,
+# блокировка упавшего запроса снимается через IDEMPOTENCY_LOCK_TIMEOUT
+IDEMPOTENCY_KEY_TIMEOUT = 24 * 60 * 60
+IDEMPOTENCY_WAIT = 5
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+
+# Наибольшее число подзапросов в POST /api/v1/batch/
+BATCH_MAX_REQUESTS = 50
+
+# Вложенные запросы POST /api/v1/query/: наибольшее число произведений
+# и число отзывов или комментариев на родителя по умолчанию и наибольшее
+NESTED_QUERY_MAX_IDS = 100
+NESTED_QUERY_DEFAULT_LIMIT = 10
+NESTED_QUERY_MAX_LIMIT = 100
+
+# Количество строк в пачке при загрузке csv-файлов командой import_csv
+IMPORT_CSV_BATCH_SIZE = 1000
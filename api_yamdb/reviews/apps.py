@@ -1,5 +1,34 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def sync_title_index(sender, using, **kwargs):
+    # flush очищает таблицы моделей, но не индекс поиска
+    # и не кэши в памяти процессов
+    from reviews.caches import (
+        categories,
+        data_version,
+        genre_titles,
+        genres,
+        titles_version,
+        users_version
+    )
+    from reviews.search import rebuild_title_index
+    rebuild_title_index(using, force=False)
+    for versioned in (
+        categories,
+        genres,
+        genre_titles,
+        data_version,
+        titles_version,
+        users_version
+    ):
+        versioned.bump()
 
 
 class ReviewsConfig(AppConfig):
     name = 'reviews'
+
+    def ready(self):
+        import reviews.signals  # noqa: F401
+        post_migrate.connect(sync_title_index, sender=self)
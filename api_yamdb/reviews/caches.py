@@ -0,0 +1,233 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class VersionCounter:
+    """
+    Счётчик версии ресурса в общем кэше Django и время его
+    последнего изменения. Начальное значение берётся из текущего
+    времени, чтобы после очистки кэша версии не повторялись.
+    """
+
+    def __init__(self, key):
+        self.key = f'version:{key}'
+        self.modified_key = f'version-modified:{key}'
+
+    def __deepcopy__(self, memo):
+        # Один объект на процесс, в том числе в копиях полей DRF
+        return self
+
+    def get(self):
+        version = cache.get(self.key)
+        if version is None:
+            cache.add(self.key, time.time_ns(), timeout=None)
+            version = cache.get(self.key)
+        return version
+
+    def last_modified(self):
+        modified = cache.get(self.modified_key)
+        if modified is None:
+            cache.add(self.modified_key, int(time.time()), timeout=None)
+            modified = cache.get(self.modified_key)
+        return modified
+
+    def bump(self):
+        try:
+            cache.incr(self.key)
+        except ValueError:
+            cache.add(self.key, time.time_ns(), timeout=None)
+        cache.set(self.modified_key, int(time.time()), timeout=None)
+
+    def invalidate(self):
+        """
+        Версия увеличивается сразу, чтобы текущий процесс видел
+        свои изменения, и ещё раз после фиксации транзакции, чтобы
+        другие процессы не сохранили данные, прочитанные до неё.
+        """
+
+        self.bump()
+        transaction.on_commit(self.bump)
+
+
+def get_versions(counters):
+    """
+    Версии и самое позднее время изменения нескольких счётчиков
+    за одно обращение к кэшу.
+    """
+
+    keys = [counter.key for counter in counters]
+    modified_keys = [counter.modified_key for counter in counters]
+    values = cache.get_many(keys + modified_keys)
+    versions = tuple(
+        values[counter.key] if counter.key in values else counter.get()
+        for counter in counters
+    )
+    last_modified = max(
+        values[counter.modified_key]
+        if counter.modified_key in values else counter.last_modified()
+        for counter in counters
+    )
+    return versions, last_modified
+
+
+class VersionedCache:
+    """
+    Данные, построенные в памяти процесса функцией builder.
+    Номер версии хранится в общем кэше Django: при записи в БД
+    версия увеличивается, и каждый процесс перестраивает данные
+    при первом обращении после этого.
+    """
+
+    def __init__(self, key, builder):
+        self.counter = VersionCounter(key)
+        self.builder = builder
+        self.lock = threading.Lock()
+        self.version = None
+        self.data = None
+
+    def __deepcopy__(self, memo):
+        # Один объект на процесс, в том числе в копиях полей DRF
+        return self
+
+    def get_version(self):
+        return self.counter.get()
+
+    def get(self):
+        version = self.get_version()
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.data = self.builder()
+                    self.version = version
+        return self.data
+
+    def bump(self):
+        self.counter.bump()
+
+    def invalidate(self):
+        self.counter.invalidate()
+
+
+def build_genre_titles():
+    from reviews.models import GenreTitle
+
+    titles = defaultdict(set)
+    for slug, title_id in GenreTitle.objects.values_list(
+        'genre__slug', 'title_id'
+    ).iterator():
+        titles[slug].add(title_id)
+    return {slug: frozenset(ids) for slug, ids in titles.items()}
+
+
+genre_titles = VersionedCache('genre-titles', build_genre_titles)
+
+
+def titles_with_genres(slugs, match_all):
+    """
+    Множество id произведений, у которых есть все (match_all)
+    или хотя бы один из жанров slugs.
+    """
+
+    index = genre_titles.get()
+    sets = [index.get(slug, frozenset()) for slug in slugs]
+    if not sets:
+        return frozenset()
+    if match_all:
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+    return frozenset().union(*sets)
+
+
+class CatalogRecord:
+    """
+    Компактная запись категории или жанра.
+    """
+
+    __slots__ = ('id', 'name', 'slug', 'normalized_name')
+
+    def __init__(self, id, name, slug, normalized_name):
+        self.id = id
+        self.name = name
+        self.slug = slug
+        self.normalized_name = normalized_name
+
+
+class Catalog:
+    """
+    Все записи справочника (категорий или жанров) в памяти процесса:
+    по id, по слагу и отсортированные по слагу, как в API.
+    """
+
+    __slots__ = ('model', 'records', 'by_id', 'by_slug', 'names')
+
+    FIELDS = ('id', 'name', 'slug', 'normalized_name')
+
+    def __init__(self, model):
+        self.model = model
+        self.records = [
+            CatalogRecord(*row)
+            for row in model.objects.order_by('slug').values_list(*self.FIELDS)
+        ]
+        self.by_id = {record.id: record for record in self.records}
+        self.by_slug = {record.slug: record for record in self.records}
+        self.names = sorted(
+            (record.normalized_name, record.slug) for record in self.records
+        )
+
+    def search(self, prefix):
+        """
+        Записи, название которых начинается с prefix
+        (в нижнем регистре), в порядке слагов.
+        """
+
+        if not prefix:
+            return self.records
+        start = bisect.bisect_left(self.names, (prefix,))
+        slugs = []
+        for name, slug in self.names[start:]:
+            if not name.startswith(prefix):
+                break
+            slugs.append(slug)
+        return [self.by_slug[slug] for slug in sorted(slugs)]
+
+    def instance(self, record):
+        """
+        Объект модели для записи, как если бы он был загружен из БД.
+        """
+
+        return self.model.from_db(
+            self.model.objects.db,
+            self.FIELDS,
+            tuple(getattr(record, field) for field in self.FIELDS)
+        )
+
+
+def build_catalog(model_name):
+    def build():
+        from django.apps import apps
+        return Catalog(apps.get_model('reviews', model_name))
+    return build
+
+
+categories = VersionedCache('categories', build_catalog('Category'))
+genres = VersionedCache('genres', build_catalog('Genre'))
+
+
+# Версии ответов API для условных GET-запросов и кэша ответов.
+# data_version меняется при записи в обход сигналов (flush, импорт).
+data_version = VersionCounter('data')
+titles_version = VersionCounter('titles')
+users_version = VersionCounter('users')
+
+
+def title_reviews_version(title_id):
+    return VersionCounter(f'title-reviews:{title_id}')
+
+
+def review_comments_version(review_id):
+    return VersionCounter(f'review-comments:{review_id}')
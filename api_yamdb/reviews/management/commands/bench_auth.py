@@ -0,0 +1,77 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.v1.authentication import (
+    StatelessJWTAuthentication,
+    VerifiedTokenCache
+)
+from api.v1.views import GenreViewSet
+from users.tokens import access_token_for
+
+
+class Command(BaseCommand):
+    help = '''Замер времени аутентификации по JWT с кэшем проверенных
+    токенов и без него: отдельно authenticate() и весь запрос
+    к списку жанров. Пользователь создаётся в транзакции,
+    которая в конце откатывается.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=5000,
+            help='Количество запросов на каждый вариант'
+        )
+        parser.add_argument(
+            '--tokens', type=int, default=10,
+            help='Количество разных токенов в запросах'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = get_user_model().objects.create(
+                username='bench-auth', email='bench-auth@yamdb.fake'
+            )
+            headers = [
+                f'Bearer {access_token_for(user)}'
+                for _ in range(options['tokens'])
+            ]
+            for maxsize in (0, len(headers)):
+                self.bench(maxsize, headers, options['requests'])
+            transaction.set_rollback(True)
+
+    def bench(self, maxsize, headers, requests):
+        token_cache = VerifiedTokenCache(maxsize)
+        authentication = type(
+            'BenchAuthentication',
+            (StatelessJWTAuthentication,),
+            {'token_cache': token_cache}
+        )
+        view = GenreViewSet.as_view(
+            {'get': 'list'}, authentication_classes=(authentication,)
+        )
+        factory = APIRequestFactory()
+        auth_timings = []
+        request_timings = []
+        for i in range(requests):
+            header = headers[i % len(headers)]
+            request = factory.get('/api/v1/genres/', HTTP_AUTHORIZATION=header)
+            start = time.perf_counter()
+            authentication().authenticate(Request(request))
+            auth_timings.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            view(request)
+            request_timings.append(time.perf_counter() - start)
+        title = f'кэш на {maxsize} токенов' if maxsize else 'без кэша'
+        self.stdout.write(
+            f'{title:<20} authenticate(): '
+            f'медиана {statistics.median(auth_timings) * 1e6:.1f} мкс; '
+            f'GET /api/v1/genres/: '
+            f'медиана {statistics.median(request_timings) * 1e6:.1f} мкс'
+        )
+        if maxsize:
+            self.stdout.write(f'{"":<20} {token_cache.stats()}')
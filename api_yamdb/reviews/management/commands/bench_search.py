@@ -0,0 +1,80 @@
+import random
+import statistics
+import string
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.v1.filters import PrefixSearchFilter
+from reviews.models import Category, Genre
+
+LETTERS = string.ascii_letters + 'абвгдежзиклмнопрстуфхцчшэюяАБВГДЕЖЗИК'
+
+
+class Command(BaseCommand):
+    help = '''Замер времени поиска по началу названия категорий, жанров
+    и username при росте таблиц. Данные создаются в транзакции,
+    которая в конце откатывается.'''
+
+    # модель, поле для поиска, функция создания объекта
+    MODELS = (
+        (Genre, 'normalized_name',
+         lambda name: Genre(name=name, slug=name)),
+        (Category, 'normalized_name',
+         lambda name: Category(name=name, slug=name)),
+        (get_user_model(), 'normalized_username',
+         lambda name: get_user_model()(username=name, email=f'{name}@b.ru')),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000,100000,1000000',
+            help='Размеры таблиц через запятую'
+        )
+        parser.add_argument(
+            '--queries', type=int, default=200,
+            help='Количество запросов поиска на каждый размер'
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        with transaction.atomic():
+            for model, field, make in self.MODELS:
+                self.bench_model(model, field, make, sizes, options['queries'])
+            transaction.set_rollback(True)
+
+    def bench_model(self, model, field, make, sizes, queries):
+        rnd = random.Random(0)
+        names = []
+        for size in sizes:
+            new = [
+                ''.join(rnd.choices(LETTERS, k=12)) + str(len(names) + i)
+                for i in range(size - len(names))
+            ]
+            model.objects.bulk_create(make(name) for name in new)
+            names.extend(new)
+            timings = [
+                self.search(model, field, rnd.choice(names)[:3])
+                for _ in range(queries)
+            ]
+            self.stdout.write(
+                f'{model.__name__:<10} {size:>9} строк: '
+                f'медиана {statistics.median(timings) * 1000:.3f} мс, '
+                f'максимум {max(timings) * 1000:.3f} мс'
+            )
+
+    def search(self, model, field, prefix):
+        view = type('View', (), {'prefix_search_field': field})
+        request = Request(APIRequestFactory().get('/', {'search': prefix}))
+        start = time.perf_counter()
+        queryset = PrefixSearchFilter().filter_queryset(
+            request, model.objects.order_by(field), view
+        )
+        queryset.count()
+        list(queryset[:settings.REST_FRAMEWORK['PAGE_SIZE']])
+        return time.perf_counter() - start
@@ -1,16 +1,108 @@
+import collections
 import contextlib
 import csv
+import itertools
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+import django
 from django.apps import apps
 from django.conf import settings
 from django.core.management import call_command
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from reviews.caches import categories, data_version, genre_titles, genres
+from reviews.search import rebuild_title_index
+
+
+def read_objects(model, csvfile):
+    """
+    Объекты модели по строкам csv-файла, по одному за раз.
+    """
+
+    for row in csv.DictReader(csvfile):
+        yield model(**row)
+
+
+def batches(objects, size):
+    """
+    Делим поток объектов на списки не длиннее size,
+    в памяти одновременно находится только один список.
+    """
+
+    objects = iter(objects)
+    while True:
+        batch = list(itertools.islice(objects, size))
+        if not batch:
+            return
+        yield batch
+
+
+def setup_worker():
+    # при запуске процессов через spawn Django ещё не настроен
+    if not apps.ready:
+        django.setup()
+
+
+def build_objects(model_label, rows):
+    """
+    Объекты модели из строк csv-файла в процессе пула: значения
+    приводятся к типам полей здесь, а не в основном процессе.
+    Возвращаем объекты и время их построения.
+    """
+
+    started = time.perf_counter()
+    model = apps.get_model(model_label)
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    objects = [
+        model(**{
+            name: fields[name].to_python(value) if name in fields else value
+            for name, value in row.items()
+        })
+        for row in rows
+    ]
+    return objects, time.perf_counter() - started
+
+
+def dependency_levels(models):
+    """
+    Делим модели на уровни по внешним ключам между ними:
+    модели одного уровня не зависят друг от друга и от следующих.
+    """
+
+    dependencies = {
+        model: {
+            field.related_model for field in model._meta.concrete_fields
+            if field.is_relation
+            and field.related_model in models
+            and field.related_model is not model
+        }
+        for model in models
+    }
+    levels = []
+    loaded = set()
+    while len(loaded) < len(models):
+        level = [
+            model for model in models
+            if model not in loaded and dependencies[model] <= loaded
+        ]
+        if not level:
+            raise CommandError('Циклическая зависимость между моделями')
+        levels.append(level)
+        loaded.update(level)
+    return levels
 
 
 class Command(BaseCommand):
     help = '''Загрузка тестовой информации из csv-файла в базу данных.
-    Вся существующая информация будет удалена из базы данных.'''
+    Вся существующая информация будет удалена из базы данных.
+    Файлы читаются потоком и сохраняются пачками по --batch-size
+    строк, каждая пачка (или с --atomic-file весь файл)
+    в своей транзакции. С --parallel строки разбираются в пуле
+    процессов, а независимые таблицы загружаются одновременно,
+    если БД это позволяет.'''
 
     # имя файла с данными, приложение, модель
     DATA = (
@@ -23,7 +115,36 @@ class Command(BaseCommand):
         ('genre_title.csv', 'reviews', 'GenreTitle'),
     )
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.IMPORT_CSV_BATCH_SIZE,
+            help='Количество строк в пачке'
+        )
+        parser.add_argument(
+            '--atomic-file', action='store_true',
+            help='Сохранять каждый файл в одной транзакции'
+        )
+        parser.add_argument(
+            '--data-dir',
+            default=os.path.join(settings.BASE_DIR, 'static', 'data'),
+            help='Папка с csv-файлами'
+        )
+        parser.add_argument(
+            '--parallel', action='store_true',
+            help='Разбирать строки в пуле процессов и загружать '
+                 'независимые таблицы одновременно'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Количество процессов разбора с --parallel'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть больше нуля')
         message = 'Данные добавлены!'
 
         # Если БД существует, очищаем её таблицы от данных
@@ -33,7 +154,39 @@ class Command(BaseCommand):
         # Выполняем миграции
         call_command('migrate')
 
+        # Находим модели и файлы с данными
+        files, message = self.get_files(options['data_dir'], message)
+
         # Импорт данных из файлов в БД
+        started = time.perf_counter()
+        if options['parallel']:
+            self.load_parallel(files, options)
+        else:
+            for fixture, current_model, path_to_file in files:
+                with open(path_to_file, newline='') as csvfile:
+                    self.load(fixture, current_model, csvfile, options)
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                f'Все файлы загружены за '
+                f'{time.perf_counter() - started:.3f} с'
+            )
+
+        # bulk_create не отправляет сигналы, пересчитываем рейтинги,
+        # индекс поиска и кэши справочников
+        apps.get_model('reviews', 'Title').objects.recalculate_ratings()
+        rebuild_title_index()
+        for versioned in (categories, genres, genre_titles, data_version):
+            versioned.invalidate()
+
+        self.stdout.write(message)
+
+    def get_files(self, data_dir, message):
+        """
+        Модели и пути к файлам из DATA до первой ошибки
+        и сообщение о результате.
+        """
+
+        files = []
         for fixture, app, model in self.DATA:
 
             # Импортрируем модель
@@ -46,23 +199,137 @@ class Command(BaseCommand):
                 break
 
             # Получаем полный путь до файла с данными
-            path_to_file = os.path.join(
-                settings.BASE_DIR, 'static', 'data', fixture
-            )
+            path_to_file = os.path.join(data_dir, fixture)
             if not os.path.exists(path_to_file):
                 message = (f'Данные не добавлены!!! '
                            f'Такой файл не существует: {path_to_file}')
                 break
 
-            with open(path_to_file, newline='') as csvfile:
+            files.append((fixture, current_model, path_to_file))
+        return files, message
 
-                # Получаем данные из csv файла
-                reader = csv.DictReader(csvfile)
+    def load(self, fixture, model, csvfile, options):
+        """
+        Сохраняем объекты из файла пачками и сообщаем о ходе загрузки:
+        после каждой пачки при --verbosity 2 и итог по файлу.
+        """
 
-                # Формируем список данных
-                bulk_data = [current_model(**row) for row in reader]
+        file_atomic = (
+            transaction.atomic() if options['atomic_file']
+            else contextlib.nullcontext()
+        )
+        rows = 0
+        started = time.perf_counter()
+        with file_atomic:
+            for batch in batches(
+                read_objects(model, csvfile), options['batch_size']
+            ):
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                rows += len(batch)
+                self.report_batch(fixture, rows, started, options)
+        self.stdout.write(
+            f'{fixture}: загружено строк {rows} '
+            f'за {time.perf_counter() - started:.3f} с, '
+            f'{self.rate(rows, started):.0f} строк/с'
+        )
 
-                # Сохраняем данные в БД
-                current_model.objects.bulk_create(bulk_data)
+    def load_parallel(self, files, options):
+        """
+        Загружаем файлы по уровням зависимостей. Файлы одного уровня
+        загружаются в отдельных потоках, у каждого своё подключение
+        к БД. SQLite допускает только одну пишущую транзакцию,
+        поэтому с ней файлы загружаются по очереди в основном потоке.
+        """
 
-        self.stdout.write(message)
+        by_model = {model: (fixture, path) for fixture, model, path in files}
+        concurrent = connection.vendor != 'sqlite'
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=setup_worker
+        ) as pool:
+            for level in dependency_levels(list(by_model)):
+                if options['verbosity'] > 1:
+                    self.stdout.write('Уровень: ' + ', '.join(
+                        by_model[model][0] for model in level
+                    ))
+                if not concurrent:
+                    for model in level:
+                        self.load_file(
+                            pool, *by_model[model], model, options
+                        )
+                    continue
+                with ThreadPoolExecutor(max_workers=len(level)) as threads:
+                    jobs = [
+                        threads.submit(
+                            self.load_file_in_thread, pool,
+                            *by_model[model], model, options
+                        )
+                        for model in level
+                    ]
+                    for job in jobs:
+                        job.result()
+
+    def load_file_in_thread(self, *args):
+        # Django открывает в каждом потоке своё подключение,
+        # закрываем его, когда поток закончил работу
+        try:
+            self.load_file(*args)
+        finally:
+            connection.close()
+
+    def load_file(self, pool, fixture, path, model, options):
+        """
+        Строки файла пачками отправляются в пул процессов, готовые
+        объекты сохраняются по порядку. В работе не больше двух пачек
+        на процесс, поэтому память не зависит от размера файла.
+        """
+
+        parse_time = save_time = 0
+        rows = 0
+        started = time.perf_counter()
+        pending = collections.deque()
+        file_atomic = (
+            transaction.atomic() if options['atomic_file']
+            else contextlib.nullcontext()
+        )
+
+        def save_next():
+            nonlocal parse_time, save_time, rows
+            objects, seconds = pending.popleft().result()
+            parse_time += seconds
+            save_started = time.perf_counter()
+            with transaction.atomic():
+                model.objects.bulk_create(objects)
+            save_time += time.perf_counter() - save_started
+            rows += len(objects)
+            self.report_batch(fixture, rows, started, options)
+
+        with open(path, newline='') as csvfile, file_atomic:
+            for batch in batches(
+                csv.DictReader(csvfile), options['batch_size']
+            ):
+                pending.append(
+                    pool.submit(build_objects, model._meta.label, batch)
+                )
+                if len(pending) >= 2 * options['workers']:
+                    save_next()
+            while pending:
+                save_next()
+        self.stdout.write(
+            f'{fixture}: загружено строк {rows} '
+            f'за {time.perf_counter() - started:.3f} с '
+            f'(разбор {parse_time:.3f} с, запись {save_time:.3f} с), '
+            f'{self.rate(rows, started):.0f} строк/с'
+        )
+
+    def report_batch(self, fixture, rows, started, options):
+        if options['verbosity'] > 1:
+            self.stdout.write(
+                f'{fixture}: строк {rows}, '
+                f'{self.rate(rows, started):.0f} строк/с'
+            )
+
+    @staticmethod
+    def rate(rows, started):
+        elapsed = time.perf_counter() - started
+        return rows / elapsed if elapsed else 0
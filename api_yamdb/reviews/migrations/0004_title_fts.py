@@ -0,0 +1,38 @@
+from django.db import DatabaseError, migrations, transaction
+
+from reviews.search import TITLE_FTS_TABLE
+
+
+def create_title_fts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE {TITLE_FTS_TABLE} '
+                f'USING fts5(name, description)'
+            )
+    except DatabaseError:
+        # SQLite собран без FTS5, поиск будет работать через icontains
+        return
+    schema_editor.execute(
+        f'INSERT INTO {TITLE_FTS_TABLE} (rowid, name, description) '
+        f'SELECT id, name, description FROM reviews_title'
+    )
+
+
+def drop_title_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TITLE_FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_pub_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_fts, drop_title_fts),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+import users.fields
+
+
+def fill_normalized_name(apps, schema_editor):
+    for model_name in ('Category', 'Genre'):
+        model = apps.get_model('reviews', model_name)
+        rows = list(model.objects.only('pk', 'name'))
+        for row in rows:
+            row.normalized_name = users.fields.normalize(row.name)
+        model.objects.bulk_update(rows, ('normalized_name',), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_title_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='normalized_name',
+            field=users.fields.NormalizedCharField(db_index=True, default='', editable=False, max_length=256, source='name', verbose_name='Название для поиска'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='normalized_name',
+            field=users.fields.NormalizedCharField(db_index=True, default='', editable=False, max_length=256, source='name', verbose_name='Название для поиска'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_normalized_name, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,11 @@
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 
 from reviews.validators import validate_title_year
+from users.fields import NormalizedCharField
 from users.models import User
 
 
@@ -19,6 +22,11 @@ class Category(models.Model):
         verbose_name='Слаг',
         unique=True
     )
+    normalized_name = NormalizedCharField(
+        verbose_name='Название для поиска',
+        max_length=256,
+        source='name'
+    )
 
     class Meta:
         verbose_name = 'Категория'
@@ -42,6 +50,11 @@ class Genre(models.Model):
         verbose_name='Слаг',
         unique=True
     )
+    normalized_name = NormalizedCharField(
+        verbose_name='Название для поиска',
+        max_length=256,
+        source='name'
+    )
 
     class Meta:
         verbose_name = 'Жанр'
@@ -52,9 +65,37 @@ class Genre(models.Model):
         return self.name
 
 
+class TitleQuerySet(models.QuerySet):
+    """
+    Набор запросов к произведениям.
+    """
+
+    def recalculate_ratings(self):
+        """
+        Пересчитываем сумму и количество оценок по отзывам.
+        Нужно после массовой загрузки отзывов в обход сигналов.
+        """
+
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')
+        ).order_by().values('title')
+        return self.update(
+            rating_sum=Coalesce(
+                Subquery(reviews.annotate(total=Sum('score')).values('total')),
+                0
+            ),
+            rating_count=Coalesce(
+                Subquery(reviews.annotate(total=Count('pk')).values('total')),
+                0
+            ),
+        )
+
+
 class Title(models.Model):
     """
     Модель для создания произведений, к которым пишут отзывы.
+    Сумма и количество оценок хранятся в самом произведении
+    и поддерживаются сигналами отзывов.
     """
 
     category = models.ForeignKey(
@@ -80,6 +121,18 @@ class Title(models.Model):
         verbose_name='Год создания',
         validators=(validate_title_year,)
     )
+    rating_sum = models.PositiveIntegerField(
+        verbose_name='Сумма оценок',
+        default=0,
+        editable=False
+    )
+    rating_count = models.PositiveIntegerField(
+        verbose_name='Количество оценок',
+        default=0,
+        editable=False
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Произведение'
@@ -88,6 +141,12 @@ class Title(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
 
 class GenreTitle(models.Model):
     """
@@ -139,6 +198,12 @@ class Review(models.Model):
     class Meta:
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
+        indexes = (
+            models.Index(
+                fields=('title', 'pub_date', 'id'),
+                name='review_title_pub_date_idx'
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('author', 'title'),
@@ -149,6 +214,12 @@ class Review(models.Model):
     def __str__(self):
         return self.text[:settings.CONFINES_TEXT]
 
+    def save(self, *args, **kwargs):
+        # post_save отправляется вне транзакции сохранения,
+        # а рейтинг произведения должен меняться вместе с отзывом.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     """
@@ -176,6 +247,12 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(
+                fields=('review', 'pub_date', 'id'),
+                name='comment_review_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:settings.CONFINES_TEXT]
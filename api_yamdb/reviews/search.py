@@ -0,0 +1,152 @@
+"""
+Полнотекстовый поиск произведений на SQLite FTS5.
+
+Индекс хранится в виртуальной таблице TITLE_FTS_TABLE, rowid которой
+совпадает с id произведения. Таблица создаётся миграцией только если
+SQLite собран с FTS5, иначе поиск работает через icontains.
+"""
+import re
+
+from django.db import connections, models
+
+TITLE_FTS_TABLE = 'reviews_title_fts'
+
+
+@models.AutoField.register_lookup
+class TitleFTSMatch(models.Lookup):
+    """
+    pk__title_fts_match=<запрос FTS5>: id есть среди найденных в индексе.
+    """
+
+    lookup_name = 'title_fts_match'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return (
+            f'{lhs} IN (SELECT rowid FROM {TITLE_FTS_TABLE} '
+            f'WHERE {TITLE_FTS_TABLE} MATCH {rhs})',
+            lhs_params + rhs_params
+        )
+
+
+class TitleFTSRank(models.Func):
+    """
+    Релевантность (bm25) произведения для запроса FTS5,
+    чем меньше значение, тем выше релевантность.
+    """
+
+    template = (
+        f'(SELECT rank FROM {TITLE_FTS_TABLE} '
+        f'WHERE {TITLE_FTS_TABLE} MATCH %(expressions)s)'
+    )
+    arg_joiner = ' AND rowid = '
+    output_field = models.FloatField()
+
+    def __init__(self, match):
+        super().__init__(models.Value(match), models.F('pk'))
+
+
+def fts_available(using='default'):
+    """
+    Проверяем, что в БД есть таблица полнотекстового индекса.
+    Положительный результат запоминается в подключении.
+    """
+
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    if getattr(connection, 'title_fts_available', False):
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            (TITLE_FTS_TABLE,)
+        )
+        connection.title_fts_available = cursor.fetchone() is not None
+    return connection.title_fts_available
+
+
+def build_match_query(text):
+    """
+    Превращаем строку поиска в запрос FTS5: все слова обязательны,
+    каждое ищется по префиксу. Возвращаем None, если слов нет.
+    """
+
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def index_title(title, using='default'):
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TITLE_FTS_TABLE} WHERE rowid = %s', (title.pk,)
+        )
+        cursor.execute(
+            f'INSERT INTO {TITLE_FTS_TABLE} (rowid, name, description) '
+            f'VALUES (%s, %s, %s)',
+            (title.pk, title.name, title.description)
+        )
+
+
+def index_titles(titles, using='default'):
+    """
+    Индексируем сразу несколько произведений, например,
+    после массовой записи в обход сигналов.
+    """
+
+    if not titles or not fts_available(using):
+        return
+    ids = [title.pk for title in titles]
+    with connections[using].cursor() as cursor:
+        # не больше 500 параметров в запросе, как и в старых SQLite
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cursor.execute(
+                f'DELETE FROM {TITLE_FTS_TABLE} WHERE rowid IN '
+                f'({", ".join(["%s"] * len(chunk))})',
+                chunk
+            )
+        cursor.executemany(
+            f'INSERT INTO {TITLE_FTS_TABLE} (rowid, name, description) '
+            f'VALUES (%s, %s, %s)',
+            [(title.pk, title.name, title.description) for title in titles]
+        )
+
+
+def unindex_title(title, using='default'):
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TITLE_FTS_TABLE} WHERE rowid = %s', (title.pk,)
+        )
+
+
+def rebuild_title_index(using='default', force=True):
+    """
+    Заполняем индекс заново по таблице произведений.
+    Без force индекс перестраивается, только если число записей
+    в нём разошлось с числом произведений (например, после flush).
+    """
+
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        if not force:
+            cursor.execute(
+                f'SELECT (SELECT COUNT(*) FROM {TITLE_FTS_TABLE}) '
+                f'= (SELECT COUNT(*) FROM reviews_title)'
+            )
+            if cursor.fetchone()[0]:
+                return
+        cursor.execute(f'DELETE FROM {TITLE_FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TITLE_FTS_TABLE} (rowid, name, description) '
+            f'SELECT id, name, description FROM reviews_title'
+        )
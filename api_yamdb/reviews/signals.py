@@ -0,0 +1,180 @@
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save
+)
+from django.dispatch import receiver
+
+from reviews import search
+from reviews.caches import (
+    categories,
+    genre_titles,
+    genres,
+    review_comments_version,
+    title_reviews_version,
+    titles_version,
+    users_version
+)
+from reviews.models import (
+    Category,
+    Comment,
+    Genre,
+    GenreTitle,
+    Review,
+    Title
+)
+from users.models import User
+
+
+def change_rating(title_id, score, count):
+    """
+    Изменяем сумму и количество оценок произведения.
+    """
+
+    Title.objects.filter(pk=title_id).update(
+        rating_sum=F('rating_sum') + score,
+        rating_count=F('rating_count') + count
+    )
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_score(sender, instance, **kwargs):
+    """
+    Запоминаем сохранённые в БД произведение и оценку,
+    чтобы при изменении отзыва учесть только разницу.
+    """
+
+    instance._previous_score = None
+    if instance.pk is not None:
+        instance._previous_score = Review.objects.filter(
+            pk=instance.pk
+        ).values_list('title_id', 'score').first()
+
+
+@receiver(post_save, sender=Review)
+def add_score(sender, instance, created, **kwargs):
+    if created:
+        change_rating(instance.title_id, instance.score, 1)
+        return
+    previous = getattr(instance, '_previous_score', None)
+    if previous is None:
+        return
+    title_id, score = previous
+    if title_id == instance.title_id:
+        if score != instance.score:
+            change_rating(title_id, instance.score - score, 0)
+        return
+    change_rating(title_id, -score, -1)
+    change_rating(instance.title_id, instance.score, 1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_score(sender, instance, **kwargs):
+    # При каскадном удалении произведения строки уже нет,
+    # и обновление просто не затронет ни одной записи.
+    change_rating(instance.title_id, -instance.score, -1)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_reviews(sender, instance, **kwargs):
+    # Отзыв меняет и список отзывов, и рейтинг в списке произведений
+    title_reviews_version(instance.title_id).invalidate()
+    previous = getattr(instance, '_previous_score', None)
+    if previous is not None and previous[0] != instance.title_id:
+        title_reviews_version(previous[0]).invalidate()
+    titles_version.invalidate()
+    if kwargs.get('created', True):
+        # Новый или удалённый отзыв меняет ответ 404 для его комментариев
+        review_comments_version(instance.pk).invalidate()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    review_comments_version(instance.review_id).invalidate()
+
+
+@receiver(post_save, sender=Title)
+def invalidate_title(sender, instance, created, **kwargs):
+    titles_version.invalidate()
+    if created:
+        # id мог принадлежать удалённому произведению
+        title_reviews_version(instance.pk).invalidate()
+
+
+@receiver(post_delete, sender=Title)
+def invalidate_deleted_title(sender, instance, **kwargs):
+    titles_version.invalidate()
+    title_reviews_version(instance.pk).invalidate()
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_username(sender, instance, **kwargs):
+    """
+    Запоминаем сохранённое в БД имя пользователя: в ответы
+    попадает только оно, остальные поля кэш не затрагивают.
+    """
+
+    instance._previous_username = None
+    if instance.pk is not None:
+        instance._previous_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_users(sender, instance, created, **kwargs):
+    # Имена авторов выводятся в отзывах и комментариях, новый
+    # пользователь ещё ничего не написал
+    if created:
+        return
+    previous = getattr(instance, '_previous_username', None)
+    if previous is None or previous != instance.username:
+        users_version.invalidate()
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, **kwargs):
+    users_version.invalidate()
+
+
+@receiver(post_save, sender=Title)
+def index_title(sender, instance, using, update_fields, **kwargs):
+    if update_fields and not {'name', 'description'} & set(update_fields):
+        return
+    search.index_title(instance, using)
+
+
+@receiver(post_delete, sender=Title)
+def unindex_title(sender, instance, using, **kwargs):
+    search.unindex_title(instance, using)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, **kwargs):
+    categories.invalidate()
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_genres(sender, **kwargs):
+    genres.invalidate()
+    genre_titles.invalidate()
+
+
+@receiver(post_save, sender=GenreTitle)
+@receiver(post_delete, sender=GenreTitle)
+def invalidate_genre_titles(sender, **kwargs):
+    genre_titles.invalidate()
+    titles_version.invalidate()
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def genre_set_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        genre_titles.invalidate()
+        titles_version.invalidate()
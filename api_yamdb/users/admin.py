@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from users.models import User
+from users.models import OutboxEmail, User
 
 
 @admin.register(User)
@@ -21,3 +21,21 @@ class UserAdmin(admin.ModelAdmin):
     )
     list_filter = ('is_active', 'role')
     search_fields = ('username', 'email')
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """
+    Представление очереди писем в админ-панели.
+    """
+
+    list_display = (
+        'recipient',
+        'subject',
+        'created_at',
+        'attempts',
+        'next_attempt_at',
+        'sent_at',
+    )
+    list_filter = ('sent_at',)
+    search_fields = ('recipient',)
@@ -0,0 +1,29 @@
+from django.db import models
+
+
+class NormalizedCharField(models.CharField):
+    """
+    Копия поля source в нижнем регистре для индексированного
+    поиска без учёта регистра. Заполняется при каждом сохранении,
+    в том числе через bulk_create.
+    """
+
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('db_index', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = normalize(getattr(model_instance, self.source) or '')
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def normalize(value):
+    return value.casefold()
@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from users.outbox import deliver_batch, due_emails
+
+
+class Command(BaseCommand):
+    help = '''Отправка писем из очереди пачками, каждая пачка через
+    одно соединение с почтовым сервером. С --loop команда
+    не завершается и проверяет очередь каждые --interval секунд.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Количество писем в пачке'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, когда очередь пуста'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между проверками пустой очереди, секунд'
+        )
+
+    def handle(self, *args, **options):
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        started = time.perf_counter()
+        while True:
+            batch_started = time.perf_counter()
+            # Соединение на пачку: за паузу между пачками сервер
+            # может закрыть его, а SMTP-бэкенд не переоткроет
+            connection = get_connection()
+            try:
+                stats = deliver_batch(connection, options['batch_size'])
+            finally:
+                connection.close()
+            if not any(stats[key] for key in totals):
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            for key in totals:
+                totals[key] += stats[key]
+            self.stdout.write(
+                f'Пачка: отправлено {stats["sent"]}, '
+                f'отложено {stats["retried"]}, '
+                f'не доставлено {stats["failed"]} '
+                f'за {time.perf_counter() - batch_started:.3f} с, '
+                f'наибольшая задержка {stats["max_delay"]:.1f} с'
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Всего: отправлено {totals["sent"]}, '
+            f'отложено {totals["retried"]}, '
+            f'не доставлено {totals["failed"]}, '
+            f'{totals["sent"] / elapsed if elapsed else 0:.1f} писем/с, '
+            f'в очереди {due_emails().count()}'
+        )
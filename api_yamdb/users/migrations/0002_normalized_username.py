@@ -0,0 +1,28 @@
+from django.db import migrations
+
+import users.fields
+
+
+def fill_normalized_username(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    rows = list(User.objects.only('pk', 'username'))
+    for user in rows:
+        user.normalized_username = users.fields.normalize(user.username)
+    User.objects.bulk_update(rows, ('normalized_username',), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='normalized_username',
+            field=users.fields.NormalizedCharField(db_index=True, default='', editable=False, max_length=150, source='username', verbose_name='Username для поиска'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_normalized_username, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+
+from users.fields import NormalizedCharField
 
 
 class User(AbstractUser):
@@ -29,6 +32,11 @@ class User(AbstractUser):
         verbose_name='email адрес',
         unique=True,
     )
+    normalized_username = NormalizedCharField(
+        verbose_name='Username для поиска',
+        max_length=150,
+        source='username',
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -51,3 +59,54 @@ class User(AbstractUser):
             or self.is_superuser
             or self.is_staff
         )
+
+
+class OutboxEmail(models.Model):
+    """
+    Письмо в очереди на отправку. Записывается в той же транзакции,
+    что и данные, из-за которых оно отправляется, а отправляет его
+    команда send_emails.
+    """
+
+    subject = models.CharField(
+        verbose_name='Тема',
+        max_length=255
+    )
+    body = models.TextField(verbose_name='Текст')
+    from_email = models.EmailField(verbose_name='Отправитель')
+    recipient = models.EmailField(verbose_name='Получатель')
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True
+    )
+    next_attempt_at = models.DateTimeField(
+        verbose_name='Следующая попытка',
+        default=timezone.now
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток отправки',
+        default=0
+    )
+    sent_at = models.DateTimeField(
+        verbose_name='Дата отправки',
+        null=True,
+        blank=True
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Письмо в очереди'
+        verbose_name_plural = 'Очередь писем'
+        ordering = ('pk',)
+        indexes = (
+            models.Index(
+                fields=('sent_at', 'next_attempt_at'),
+                name='outbox_due_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
@@ -0,0 +1,127 @@
+"""
+Очередь писем (transactional outbox).
+
+enqueue() записывает письмо в таблицу OutboxEmail в текущей транзакции,
+deliver_batch() отправляет пачку готовых писем через одно соединение
+с почтовым сервером. Неудачная отправка повторяется с экспоненциально
+растущей задержкой, пока не исчерпано EMAIL_OUTBOX_MAX_ATTEMPTS попыток.
+"""
+import contextlib
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import OutboxEmail
+
+
+def enqueue(subject, body, recipient, from_email=None):
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.FROM,
+        recipient=recipient,
+    )
+
+
+def retry_delay(attempts):
+    """
+    Задержка перед следующей попыткой: удваивается с каждой
+    неудачей, со случайным разбросом до четверти, чтобы письма
+    не повторялись одновременно.
+    """
+
+    delay = min(
+        settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.EMAIL_OUTBOX_MAX_RETRY_DELAY
+    )
+    return timedelta(seconds=delay * random.uniform(1, 1.25))
+
+
+def due_emails():
+    return OutboxEmail.objects.filter(
+        sent_at__isnull=True,
+        next_attempt_at__lte=timezone.now(),
+        attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    )
+
+
+def claim_batch(batch_size):
+    """
+    Забираем пачку писем: до конца аренды EMAIL_OUTBOX_LEASE
+    их не возьмёт другой процесс.
+    """
+
+    with transaction.atomic():
+        emails = list(
+            due_emails().select_for_update(skip_locked=True)[:batch_size]
+        )
+        OutboxEmail.objects.filter(
+            pk__in=[email.pk for email in emails]
+        ).update(
+            next_attempt_at=timezone.now() + timedelta(
+                seconds=settings.EMAIL_OUTBOX_LEASE
+            )
+        )
+    return emails
+
+
+def deliver_batch(connection, batch_size=None):
+    """
+    Отправляем одну пачку писем через соединение connection,
+    после ошибки отправки оно открывается заново.
+    Возвращаем метрики: сколько писем отправлено, отложено до следующей
+    попытки и отброшено после последней, и наибольшую задержку
+    доставки от создания письма в секундах.
+    """
+
+    emails = claim_batch(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    stats = {'sent': 0, 'retried': 0, 'failed': 0, 'max_delay': 0.0}
+    sent = []
+    failures = []
+    for email in emails:
+        message = EmailMessage(
+            subject=email.subject,
+            body=email.body,
+            from_email=email.from_email,
+            to=[email.recipient],
+            connection=connection,
+        )
+        try:
+            # открывается только для непустой пачки и после ошибки
+            connection.open()
+            message.send()
+        except Exception as error:
+            failures.append((email, error))
+            # SMTP не переоткрывает разорванное соединение само:
+            # закрываем его, и следующее письмо откроет новое
+            with contextlib.suppress(Exception):
+                connection.close()
+        else:
+            sent.append(email)
+
+    now = timezone.now()
+    OutboxEmail.objects.filter(pk__in=[email.pk for email in sent]).update(
+        sent_at=now, attempts=F('attempts') + 1, last_error=''
+    )
+    stats['sent'] = len(sent)
+    if sent:
+        stats['max_delay'] = max(
+            (now - email.created_at).total_seconds() for email in sent
+        )
+    for email, error in failures:
+        attempts = email.attempts + 1
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            attempts=attempts,
+            last_error=f'{type(error).__name__}: {error}',
+            next_attempt_at=now + retry_delay(attempts)
+        )
+        if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            stats['failed'] += 1
+        else:
+            stats['retried'] += 1
+    return stats
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import User
+from users.tokens import forget_token_version
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_token_version(sender, instance, **kwargs):
+    forget_token_version(instance.pk)
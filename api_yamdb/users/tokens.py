@@ -0,0 +1,77 @@
+"""
+Токены доступа с ролью пользователя.
+
+Кроме id пользователя, в токен записываются роль, флаги is_staff
+и is_superuser и версия TOKEN_VERSION_CLAIM - отпечаток этих полей
+и is_active. Текущая версия каждого пользователя хранится в общем
+для процессов кэше Django не дольше TOKEN_VERSION_CACHE_TIMEOUT
+секунд. Если роль изменилась, пользователь заблокирован или удалён,
+версия перестаёт совпадать, и токен больше не принимается: сразу,
+если запись прошла через сигналы модели, иначе после истечения
+версии в кэше.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.tokens import AccessToken
+
+TOKEN_VERSION_CLAIM = 'ver'
+# Версия удалённого пользователя, не совпадает ни с одним токеном
+MISSING_VERSION = ''
+
+
+def token_version(role, is_staff, is_superuser, is_active):
+    state = f'{role}:{is_staff:d}:{is_superuser:d}:{is_active:d}'
+    return hashlib.md5(state.encode()).hexdigest()[:12]
+
+
+def version_cache_key(user_id):
+    return f'token-version:{user_id}'
+
+
+def current_token_version(user_id):
+    """
+    Текущая версия токенов пользователя: из кэша,
+    а при его отсутствии одним запросом к БД. Версия, прочитанная
+    до изменения пользователя, может попасть в кэш уже после его
+    сброса, поэтому она хранится ограниченное время.
+    """
+
+    from users.models import User
+
+    key = version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        state = User.objects.filter(pk=user_id).values_list(
+            'role', 'is_staff', 'is_superuser', 'is_active'
+        ).first()
+        version = token_version(*state) if state else MISSING_VERSION
+        cache.add(
+            key, version, timeout=settings.TOKEN_VERSION_CACHE_TIMEOUT
+        )
+    return version
+
+
+def forget_token_version(user_id):
+    """
+    Сбрасываем версию сразу и после фиксации транзакции,
+    чтобы следующий запрос прочитал её из БД.
+    """
+
+    key = version_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def access_token_for(user):
+    token = AccessToken.for_user(user)
+    token['username'] = user.username
+    token['role'] = user.role
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token[TOKEN_VERSION_CLAIM] = token_version(
+        user.role, user.is_staff, user.is_superuser, user.is_active
+    )
+    return token
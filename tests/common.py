@@ -1,3 +1,5 @@
+import multiprocessing
+
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -113,3 +115,21 @@ def create_comments(admin_client, admin):
     result.append({'id': create_comment(client_moderator, titles[0]["id"], reviews[0]["id"], 'qwerty321'),
                    'author': moderator.username, 'text': 'qwerty321'})
     return result, reviews, titles, user, moderator
+
+
+def start_process(target, *args):
+    """
+    Запускаем target в другом процессе, как в другом воркере сервера.
+    """
+
+    process = multiprocessing.get_context('fork').Process(
+        target=target, args=args
+    )
+    process.start()
+    return process
+
+
+def run_in_process(target, *args):
+    process = start_process(target, *args)
+    process.join()
+    assert process.exitcode == 0
@@ -1,6 +1,9 @@
 import os
+import shutil
 import sys
+import tempfile
 
+import pytest
 from django.utils.version import get_version
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -34,3 +37,30 @@ assert get_version() < '3.0.0', 'Пожалуйста, используйте в
 pytest_plugins = [
     'tests.fixtures.fixture_user',
 ]
+
+TEST_CACHE_DIR = tempfile.mkdtemp(prefix='api_yamdb_tests_')
+
+
+def pytest_configure(config):
+    # У тестов свой каталог кэша: clear_cache не должен очищать
+    # кэш сервера разработки, запущенного из того же проекта
+    from django.conf import settings
+    settings.CACHES = {
+        'default': {
+            **settings.CACHES['default'],
+            'LOCATION': os.path.join(TEST_CACHE_DIR, 'default'),
+        }
+    }
+    settings.RESPONSE_CACHE_LOCK_DIR = os.path.join(TEST_CACHE_DIR, 'locks')
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TEST_CACHE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Кэш общий для всех тестов,
+    # а откат транзакции теста не меняет версии в нём
+    from django.core.cache import cache
+    cache.clear()
@@ -1,6 +1,9 @@
+from io import StringIO
+
 import pytest
 from django.contrib.auth import get_user_model
 from django.core import mail
+from django.core.management import call_command
 
 User = get_user_model()
 
@@ -85,6 +88,11 @@ class Test00UserRegistration:
         }
         request_type = 'POST'
         response = client.post(self.url_signup, data=valid_data)
+        assert len(mail.outbox) == outbox_before_count, (
+            f'Проверьте, что при {request_type} запросе `{self.url_signup}` '
+            'письмо не отправляется в запросе, а ставится в очередь'
+        )
+        call_command('send_emails', stdout=StringIO())
         outbox_after = mail.outbox  # email outbox after user create
 
         assert response.status_code != 404, (
@@ -279,3 +287,52 @@ class Test00UserRegistration:
             f'Проверьте, что при {request_type} запросе `{self.url_signup}` нельзя создать '
             f'пользователя, username которого уже зарегистрирован и возвращается статус {code}'
         )
+
+    @pytest.mark.django_db
+    def test_00_signup_and_token_throttling(self, client, settings):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {
+                'signup_ip': '4/hour',
+                'signup_email': '2/hour',
+                'token_ip': '3/hour',
+                'token_username': '100/hour',
+            },
+        }
+        data = {'email': 'throttle@yamdb.fake', 'username': 'throttle'}
+        response = client.post(self.url_signup, data=data)
+        assert response.status_code == 200
+        assert response['X-RateLimit-Limit'] == '2' and response['X-RateLimit-Remaining'] == '1', (
+            f'Проверьте, что ответ `{self.url_signup}` содержит оставшуюся квоту'
+        )
+        response = client.post(self.url_signup, data={**data, 'email': 'THROTTLE@yamdb.fake'})
+        assert response['X-RateLimit-Remaining'] == '0'
+        response = client.post(self.url_signup, data=data)
+        assert response.status_code == 429, (
+            f'Проверьте, что `{self.url_signup}` ограничивает число запросов для одного email'
+        )
+        assert response.has_header('Retry-After')
+        response = client.post(self.url_signup, data={'email': 'other@yamdb.fake', 'username': 'other'})
+        assert response.status_code == 200, (
+            f'Проверьте, что ограничение `{self.url_signup}` для email не влияет на другие email'
+        )
+        response = client.post(self.url_signup, data={'email': 'third@yamdb.fake', 'username': 'third'})
+        assert response.status_code == 429, (
+            f'Проверьте, что `{self.url_signup}` ограничивает число запросов с одного IP'
+        )
+        for _ in range(3):
+            response = client.post(self.url_token, data={'username': 'throttle', 'confirmation_code': '1'})
+            assert response.status_code == 400
+        response = client.post(self.url_token, data={'username': 'throttle', 'confirmation_code': '1'})
+        assert response.status_code == 429, (
+            f'Проверьте, что `{self.url_token}` ограничивает число запросов с одного IP'
+        )
+
+    @pytest.mark.django_db
+    def test_00_throttling_json_array_body(self, client):
+        for url in (self.url_signup, self.url_token):
+            response = client.post(url, data=[1, 2], content_type='application/json')
+            assert response.status_code == 400, (
+                f'Проверьте, что POST запрос `{url}` с JSON-массивом в теле '
+                'возвращает статус 400'
+            )
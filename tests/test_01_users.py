@@ -1,7 +1,7 @@
 import pytest
 from django.contrib.auth import get_user_model
 
-from .common import auth_client, create_users_api
+from .common import auth_client, create_users_api, run_in_process
 
 
 class Test01UserAPI:
@@ -571,3 +571,118 @@ class Test01UserAPI:
             'Проверьте, что при PATCH запросе `/api/v1/users/me/`, '
             'пользователь с ролью user не может сменить себе роль'
         )
+
+    def test_12_stateless_token(self, admin, django_assert_num_queries):
+        from rest_framework.test import APIClient
+        from users.tokens import access_token_for
+
+        client = APIClient()
+        token = access_token_for(admin)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = client.get('/api/v1/users/')
+        assert response.status_code == 200, (
+            'Проверьте, что токен с ролью даёт админу доступ к `/api/v1/users/`'
+        )
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/users/')
+        assert response.status_code == 200, (
+            'Проверьте, что для токена с ролью пользователь не загружается из БД'
+        )
+        response = client.get('/api/v1/users/me/')
+        assert response.json().get('username') == admin.username, (
+            'Проверьте, что `/api/v1/users/me/` возвращает данные владельца токена'
+        )
+        admin.role = 'user'
+        admin.save()
+        response = client.get('/api/v1/users/me/')
+        assert response.status_code == 401, (
+            'Проверьте, что после смены роли старый токен не принимается'
+        )
+        token = access_token_for(admin)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = client.get('/api/v1/users/')
+        assert response.status_code == 403, (
+            'Проверьте, что новый токен содержит новую роль'
+        )
+        admin.delete()
+        response = client.get('/api/v1/users/me/')
+        assert response.status_code == 401, (
+            'Проверьте, что токен удалённого пользователя не принимается'
+        )
+
+    def test_13_verified_token_cache(self, admin):
+        from rest_framework.test import APIClient
+        from api.v1.authentication import VerifiedTokenCache, verified_tokens
+        from users.tokens import access_token_for
+
+        verified_tokens.clear()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token_for(admin)}')
+        for _ in range(3):
+            assert client.get('/api/v1/users/').status_code == 200
+        stats = verified_tokens.stats()
+        assert (stats['misses'], stats['hits'], stats['size']) == (1, 2, 1), (
+            'Проверьте, что проверенный токен берётся из кэша'
+        )
+        client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        assert client.get('/api/v1/users/').status_code == 401, (
+            'Проверьте, что неверный токен не принимается'
+        )
+        assert verified_tokens.stats()['size'] == 1, (
+            'Проверьте, что неверный токен не попадает в кэш'
+        )
+
+        tokens = VerifiedTokenCache(2)
+        for key in ('a', 'b', 'c'):
+            tokens.set(key, access_token_for(admin))
+        assert tokens.get('a') is None and tokens.get('c') is not None
+        assert tokens.stats()['evictions'] == 1, (
+            'Проверьте, что при переполнении вытесняется старый токен'
+        )
+        token = access_token_for(admin)
+        token['exp'] = 0
+        tokens.set('d', token)
+        assert tokens.get('d') is None and tokens.stats()['expired'] == 1, (
+            'Проверьте, что истёкший токен удаляется из кэша'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_14_token_revoked_in_other_process(self, admin, settings):
+        import time
+
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        from users.tokens import (access_token_for, current_token_version,
+                                  version_cache_key)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token_for(admin)}')
+        key = version_cache_key(admin.pk)
+        old_version = current_token_version(admin.pk)
+
+        def other_worker_caches_version():
+            # другой процесс уже проверял токен и помнит его версию
+            cache.set(key, old_version)
+
+        def other_worker_sees_reset():
+            assert cache.get(key) != old_version
+
+        run_in_process(other_worker_caches_version)
+        admin.role = 'user'
+        admin.save()
+        run_in_process(other_worker_sees_reset)
+        assert client.get('/api/v1/users/').status_code == 401, (
+            'Проверьте, что после смены роли старый токен не принимается '
+            'и там, где его версия была в кэше другого процесса'
+        )
+
+        settings.TOKEN_VERSION_CACHE_TIMEOUT = 1
+        cache.delete(key)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token_for(admin)}')
+        assert client.get('/api/v1/users/me/').status_code == 200
+        get_user_model().objects.filter(pk=admin.pk).update(is_active=False)
+        time.sleep(1.1)
+        assert client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что версия токенов хранится в кэше ограниченное время '
+            'и изменения в обход сигналов тоже отзывают токен'
+        )
@@ -1,6 +1,7 @@
 import pytest
 
-from .common import auth_client, create_genre, create_users_api
+from .common import (auth_client, create_genre, create_titles, create_users_api,
+                     run_in_process)
 
 
 class Test03GenreAPI:
@@ -166,3 +167,33 @@ class Test03GenreAPI:
             f'Проверьте, что при POST запросе на `{url}`, создание жанров недоступно для '
             f'пользователя с ролью moderator'
         )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_genres_invalidated_by_other_process(self, client, admin_client):
+        from reviews.caches import genre_titles, genres
+        from reviews.models import Genre, GenreTitle
+
+        create_titles(admin_client)
+        client.get('/api/v1/genres/')
+        title_ids = [title['id'] for title in client.get(
+            '/api/v1/titles/', {'genre': 'horror'}
+        ).json()['results']]
+
+        # Другой процесс изменил данные и увеличил версии в кэше
+        Genre.objects.filter(slug='horror').update(name='Хоррор')
+        GenreTitle.objects.filter(genre__slug='horror').delete()
+        run_in_process(genres.bump)
+        run_in_process(genre_titles.bump)
+
+        names = [
+            genre['name'] for genre in client.get('/api/v1/genres/').json()['results']
+        ]
+        assert 'Хоррор' in names, (
+            'Проверьте, что список жанров обновляется после записи в другом '
+            'процессе: кэш версий должен быть общим для процессов'
+        )
+        assert title_ids and client.get(
+            '/api/v1/titles/', {'genre': 'horror'}
+        ).json()['results'] == [], (
+            'Проверьте, что фильтр по жанрам учитывает изменения из другого процесса'
+        )
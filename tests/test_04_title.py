@@ -249,3 +249,174 @@ class Test04TitleAPI:
         user, moderator = create_users_api(admin_client)
         self.check_permissions(user, 'обычного пользователя', titles, categories, genres)
         self.check_permissions(moderator, 'модератора', titles, categories, genres)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_titles_count_modes(self, client, admin_client):
+        create_titles(admin_client)
+        response = client.get('/api/v1/titles/', {'count': 'none', 'limit': 1})
+        data = response.json()
+        assert 'count' not in data and data['has_next'] is True and data['next'], (
+            'Проверьте, что при GET запросе `/api/v1/titles/?count=none` '
+            'не возвращается `count`, а `has_next` показывает наличие следующей страницы'
+        )
+        response = client.get(data['next'])
+        data = response.json()
+        assert data['has_next'] is False and data['next'] is None and len(data['results']) == 1, (
+            'Проверьте, что на последней странице `/api/v1/titles/?count=none` '
+            '`has_next` равен False'
+        )
+        response = client.get('/api/v1/titles/', {'count': 'estimate'})
+        assert response.json()['count'] == 2, (
+            'Проверьте, что при GET запросе `/api/v1/titles/?count=estimate` возвращается `count`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_titles_search(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.patch(
+            f'/api/v1/titles/{titles[1]["id"]}/', data={'description': 'Поворотный момент'}
+        )
+        response = client.get('/api/v1/titles/', {'search': 'пово'})
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/titles/?search=` возвращается статус 200'
+        )
+        data = response.json()
+        assert {title['id'] for title in data['results']} == {titles[0]['id'], titles[1]['id']}, (
+            'Проверьте, что поиск `/api/v1/titles/?search=` находит произведения по началу слов '
+            'в названии и описании'
+        )
+        response = client.get('/api/v1/titles/', {'search': 'проект момент'})
+        data = response.json()
+        assert [title['id'] for title in data['results']] == [titles[1]['id']], (
+            'Проверьте, что поиск `/api/v1/titles/?search=` требует совпадения всех слов'
+        )
+        admin_client.delete(f'/api/v1/titles/{titles[1]["id"]}/')
+        response = client.get('/api/v1/titles/', {'search': 'момент'})
+        assert response.json()['count'] == 0, (
+            'Проверьте, что удалённое произведение не находится поиском'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_titles_genre_modes(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+
+        def found(params):
+            response = client.get('/api/v1/titles/', params)
+            assert response.status_code == 200, (
+                'Проверьте, что при GET запросе `/api/v1/titles/` с фильтром по жанрам '
+                'возвращается статус 200'
+            )
+            return {title['id'] for title in response.json()['results']}
+
+        assert found({'genre': 'horror,comedy', 'genre_mode': 'all'}) == {titles[0]['id']}, (
+            'Проверьте, что `genre_mode=all` оставляет произведения со всеми жанрами'
+        )
+        assert found({'genre': 'horror,drama', 'genre_mode': 'all'}) == set(), (
+            'Проверьте, что `genre_mode=all` оставляет произведения со всеми жанрами'
+        )
+        assert found({'genre': 'horror,drama', 'genre_mode': 'any'}) == {titles[0]['id'], titles[1]['id']}, (
+            'Проверьте, что `genre_mode=any` оставляет произведения с любым из жанров'
+        )
+        assert found({'genre': 'horror,drama'}) == {titles[0]['id'], titles[1]['id']}, (
+            'Проверьте, что без `genre_mode` фильтр оставляет произведения '
+            'с любым из жанров'
+        )
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/', data={'genre': ['horror']})
+        assert found({'genre': 'horror'}) == {titles[0]['id'], titles[1]['id']}, (
+            'Проверьте, что фильтр по жанрам учитывает изменение жанров произведения'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_titles_facets(self, client, admin_client, settings):
+        settings.TITLE_FACETS_CACHE_TIMEOUT = 0
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/facets/')
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/titles/facets/` возвращается статус 200'
+        )
+        data = response.json()
+        assert data['count'] == 2 and data['year'] == [
+            {'year': 2000, 'count': 1}, {'year': 2020, 'count': 1}
+        ], (
+            'Проверьте, что `/api/v1/titles/facets/` возвращает количество произведений по годам'
+        )
+        assert {genre['slug']: genre['count'] for genre in data['genre']} == {
+            'horror': 1, 'comedy': 1, 'drama': 1
+        }, (
+            'Проверьте, что `/api/v1/titles/facets/` возвращает количество произведений по жанрам'
+        )
+        response = client.get('/api/v1/titles/facets/', {'category': 'films'})
+        data = response.json()
+        assert data['category'] == [{'slug': 'films', 'name': 'Фильм', 'count': 1}], (
+            'Проверьте, что `/api/v1/titles/facets/` учитывает параметры фильтрации'
+        )
+        assert [genre['slug'] for genre in data['genre']] == ['comedy', 'horror'], (
+            'Проверьте, что `/api/v1/titles/facets/` учитывает параметры фильтрации'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_titles_bulk(self, client, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/bulk/'
+        data = [
+            {'name': 'Новое', 'year': 1999, 'genre': ['drama', 'comedy'],
+             'category': 'books'},
+            {'id': titles[0]['id'], 'name': 'Поворот обратно', 'year': 2001,
+             'genre': ['drama'], 'category': 'films', 'description': 'Другое'},
+            {'name': 'Ещё новое', 'year': 2010, 'genre': [], 'category': 'films'},
+        ]
+        response = user_client.post(url, data=data, format='json')
+        assert response.status_code == 403, (
+            f'Проверьте, что POST запрос `{url}` доступен только админу'
+        )
+        invalid = [dict(data[0]), dict(data[1], genre=['unknown']), {'id': 0, **data[2]}]
+        response = admin_client.post(url, data=invalid, format='json')
+        assert response.status_code == 400, (
+            f'Проверьте, что POST запрос `{url}` с ошибками возвращает статус 400'
+        )
+        errors = response.json()
+        assert errors[0] == {} and 'genre' in errors[1] and 'id' in errors[2], (
+            f'Проверьте, что POST запрос `{url}` возвращает ошибки по элементам'
+        )
+        assert client.get('/api/v1/titles/').json()['count'] == 2, (
+            'Проверьте, что при ошибках произведения не создаются'
+        )
+
+        response = admin_client.post(url, data=data, format='json')
+        assert response.status_code == 201, (
+            f'Проверьте, что POST запрос `{url}` возвращает статус 201'
+        )
+        result = response.json()
+        assert [item['name'] for item in result] == ['Новое', 'Поворот обратно', 'Ещё новое']
+        assert result[1]['id'] == titles[0]['id']
+        assert sorted(result[0]['genre']) == ['comedy', 'drama']
+        assert client.get('/api/v1/titles/').json()['count'] == 4, (
+            f'Проверьте, что POST запрос `{url}` создаёт новые произведения'
+        )
+        for item in result:
+            title = client.get(f'/api/v1/titles/{item["id"]}/').json()
+            assert title['name'] == item['name'] and sorted(
+                genre['slug'] for genre in title['genre']
+            ) == sorted(item['genre']), (
+                f'Проверьте, что POST запрос `{url}` сохраняет произведения и жанры'
+            )
+        response = client.get('/api/v1/titles/', {'genre': 'drama'})
+        assert {title['id'] for title in response.json()['results']} == {
+            result[0]['id'], result[1]['id'], titles[1]['id']
+        }, 'Проверьте, что фильтр по жанрам учитывает массовую запись'
+        response = client.get('/api/v1/titles/', {'search': 'обратно'})
+        assert [title['id'] for title in response.json()['results']] == [result[1]['id']], (
+            'Проверьте, что поиск учитывает массовую запись'
+        )
+
+        item = {'name': 'Строковый id', 'year': 2000, 'genre': [], 'category': 'films'}
+        response = admin_client.post(
+            url, data=[{'id': str(titles[1]['id']), **item}], format='json'
+        )
+        assert response.status_code == 201 and response.json()[0]['id'] == titles[1]['id'], (
+            f'Проверьте, что POST запрос `{url}` принимает id строкой, как IntegerField'
+        )
+        response = admin_client.post(url, data=[{'id': True, **item}], format='json')
+        assert response.status_code == 400 and 'id' in response.json()[0], (
+            f'Проверьте, что POST запрос `{url}` не принимает true вместо id'
+        )
@@ -1,7 +1,10 @@
+import multiprocessing
+import time
+
 import pytest
 
 from .common import (auth_client, create_reviews, create_titles,
-                     create_users_api)
+                     create_users_api, start_process)
 
 
 class Test05ReviewAPI:
@@ -334,3 +337,143 @@ class Test05ReviewAPI:
             'без токена авторизации возвращается статус 401'
         )
         self.check_permissions(user, 'обычного пользователя', reviews, titles)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_reviews_cursor_pagination(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        response = client.get(url, {'cursor': '', 'limit': 2})
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/titles/{title_id}/reviews/?cursor=` '
+            'возвращается статус 200'
+        )
+        data = response.json()
+        assert 'count' not in data and data['previous'] is None, (
+            'Проверьте, что курсорная пагинация не возвращает `count`'
+        )
+        ids = [review['id'] for review in data['results']]
+        response = client.get(data['next'])
+        data = response.json()
+        ids += [review['id'] for review in data['results']]
+        assert ids == [review['id'] for review in reviews], (
+            'Проверьте, что курсорная пагинация возвращает все отзывы '
+            'в порядке публикации'
+        )
+        assert data['next'] is None and data['previous'], (
+            'Проверьте ссылки `next` и `previous` на последней странице'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_review_idempotency_key(
+        self, admin_client, user_client, settings, tmp_path
+    ):
+        from rest_framework.request import Request
+        from rest_framework.response import Response
+        from rest_framework.test import APIRequestFactory
+        from api.v1.idempotency import idempotent_call
+
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        data = {'text': 'Отзыв', 'score': 7}
+        first = user_client.post(url, data=data, HTTP_IDEMPOTENCY_KEY='key-1')
+        assert first.status_code == 201
+        retry = user_client.post(url, data=data, HTTP_IDEMPOTENCY_KEY='key-1')
+        assert retry.status_code == 201 and retry.json() == first.json(), (
+            f'Проверьте, что повтор POST запроса `{url}` с тем же Idempotency-Key '
+            'возвращает первый ответ'
+        )
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert len(admin_client.get(url).json()['results']) == 1, (
+            'Проверьте, что повтор запроса не создаёт второй отзыв'
+        )
+        response = user_client.post(
+            url, data={'text': 'Другой', 'score': 1}, HTTP_IDEMPOTENCY_KEY='key-1'
+        )
+        assert response.status_code == 422, (
+            'Проверьте, что ключ нельзя использовать с другим телом запроса'
+        )
+        response = admin_client.post(url, data=data, HTTP_IDEMPOTENCY_KEY='key-1')
+        assert response.status_code == 201, (
+            'Проверьте, что ключи разных пользователей не пересекаются'
+        )
+
+        # повторы одновременно приходят в разные процессы сервера
+        settings.IDEMPOTENCY_WAIT = 5
+        calls = tmp_path / 'calls'
+        barrier = multiprocessing.get_context('fork').Barrier(4)
+
+        def worker():
+            request = Request(APIRequestFactory().post(
+                '/api/v1/auth/signup/', HTTP_IDEMPOTENCY_KEY='key-2'
+            ))
+
+            def handler():
+                with open(calls, 'a') as file:
+                    file.write('call\n')
+                time.sleep(0.3)
+                return Response(status=200)
+
+            barrier.wait()
+            assert idempotent_call(request, handler).status_code == 200
+
+        processes = [start_process(worker) for _ in range(4)]
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+        assert calls.read_text().count('call') == 1, (
+            'Проверьте, что повторы, одновременно пришедшие в разные '
+            'процессы, не выполняют обработчик второй раз'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_batch_requests(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        reviews_url = f'{title_url}reviews/'
+        response = admin_client.post('/api/v1/batch/', data={'requests': [
+            {'method': 'GET', 'path': title_url},
+            {'method': 'GET', 'path': f'{reviews_url}?limit=2'},
+            {'method': 'POST', 'path': f'{reviews_url}{reviews[1]["id"]}/comments/',
+             'body': {'text': 'Комментарий'}},
+            {'method': 'GET', 'path': '/api/v1/auth/signup/'},
+        ]}, format='json')
+        assert response.status_code == 200, (
+            'Проверьте, что POST запрос `/api/v1/batch/` возвращает статус 200'
+        )
+        data = response.json()
+        assert [item['status'] for item in data] == [200, 200, 201, 404], (
+            'Проверьте, что `/api/v1/batch/` возвращает ответы подзапросов по порядку '
+            'и выполняет только запросы к ресурсам router_v1'
+        )
+        assert data[0]['body'] == admin_client.get(title_url).json()
+        assert data[0]['headers']['Content-Type'] == 'application/json', (
+            'Проверьте, что `/api/v1/batch/` возвращает заголовки '
+            'отрисованного ответа подзапроса'
+        )
+        assert len(data[1]['body']['results']) == 2
+        assert data[2]['body']['author'] == admin.username, (
+            'Проверьте, что подзапросы выполняются от пользователя пакета'
+        )
+
+        response = client.post('/api/v1/batch/', data={'requests': [
+            {'method': 'POST', 'path': reviews_url, 'body': {'text': 'a', 'score': 1}},
+        ]}, content_type='application/json')
+        assert response.json()[0]['status'] == 401, (
+            'Проверьте, что подзапросы анонимного пакета не аутентифицированы'
+        )
+
+        response = admin_client.post('/api/v1/batch/', data={'atomic': True, 'requests': [
+            {'method': 'PATCH', 'path': title_url, 'body': {'name': 'Новое'}},
+            {'method': 'POST', 'path': reviews_url, 'body': {'text': 'a', 'score': 1}},
+            {'method': 'GET', 'path': title_url},
+        ]}, format='json')
+        assert [item['status'] for item in response.json()] == [200, 400, 424], (
+            'Проверьте, что в режиме atomic после ошибки остальные подзапросы '
+            'не выполняются'
+        )
+        assert admin_client.get(title_url).json()['name'] == titles[0]['name'], (
+            'Проверьте, что в режиме atomic изменения откатываются при ошибке'
+        )
+
+        response = admin_client.post('/api/v1/batch/', data={'requests': []}, format='json')
+        assert response.status_code == 400
@@ -0,0 +1,516 @@
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from .common import auth_client, run_in_process, start_process
+
+PAGE_SIZES = (5, 50, 500)
+
+# Допустимое количество запросов к БД на один запрос к API,
+# не зависящее от размера страницы.
+QUERY_BUDGETS = {
+    'titles': 3,
+    'reviews': 3,
+    'comments': 3,
+    # пользователь, произведение, отзыв, прежняя оценка, UPDATE
+    # и SAVEPOINT/RELEASE транзакции сохранения отзыва
+    'review_patch': 7,
+    # родительские объекты загружаются один раз за запрос
+    'comment_create': 3,
+    'review_create': 7,
+    # жанры и категория по слагам берутся из кэша справочников
+    'title_create': 8,
+    # произведения, отзывы, авторы отзывов, комментарии и их авторы
+    'nested_query': 5,
+}
+
+
+@pytest.fixture
+def catalog(db):
+    from reviews.models import (Category, Comment, Genre, GenreTitle,
+                                Review, Title)
+
+    size = max(PAGE_SIZES)
+    get_user_model().objects.bulk_create(
+        get_user_model()(username=f'user{i}', email=f'user{i}@yamdb.fake')
+        for i in range(size)
+    )
+    users = list(get_user_model().objects.order_by('pk'))
+    category = Category.objects.create(name='Фильм', slug='films')
+    genres = [
+        Genre.objects.create(name='Драма', slug='drama'),
+        Genre.objects.create(name='Комедия', slug='comedy'),
+    ]
+    Title.objects.bulk_create(
+        Title(name=f'Произведение {i}', year=2000, category=category)
+        for i in range(size)
+    )
+    titles = list(Title.objects.order_by('pk'))
+    GenreTitle.objects.bulk_create(
+        GenreTitle(title=title, genre=genre)
+        for title in titles for genre in genres
+    )
+    title = titles[0]
+    Review.objects.bulk_create(
+        Review(title=title, author=user, text='Отзыв', score=5)
+        for user in users
+    )
+    review = Review.objects.filter(title=title).order_by('pk').first()
+    Comment.objects.bulk_create(
+        Comment(review=review, author=user, text='Комментарий')
+        for user in users
+    )
+    return title, review
+
+
+def endpoint_url(name, title, review):
+    return {
+        'titles': '/api/v1/titles/',
+        'reviews': f'/api/v1/titles/{title.pk}/reviews/',
+        'comments': f'/api/v1/titles/{title.pk}/reviews/{review.pk}/comments/',
+    }[name]
+
+
+class Test08QueryCount:
+
+    @pytest.mark.parametrize('limit', PAGE_SIZES)
+    @pytest.mark.parametrize('name', ('titles', 'reviews', 'comments'))
+    def test_01_list_query_budget(
+        self, client, catalog, django_assert_num_queries, name, limit
+    ):
+        title, review = catalog
+        url = endpoint_url(name, title, review)
+        with django_assert_num_queries(QUERY_BUDGETS[name]):
+            response = client.get(url, {'limit': limit})
+        assert len(response.json()['results']) == limit, (
+            f'Проверьте, что при GET запросе `{url}` возвращается {limit} записей'
+        )
+
+    def test_02_review_patch_query_budget(
+        self, catalog, django_assert_num_queries
+    ):
+        title, review = catalog
+        client = auth_client(review.author)
+        url = f'/api/v1/titles/{title.pk}/reviews/{review.pk}/'
+        with django_assert_num_queries(QUERY_BUDGETS['review_patch']):
+            response = client.patch(url, data={'text': 'Новый текст'})
+        assert response.status_code == 200, (
+            f'Проверьте, что автор может изменить отзыв PATCH запросом `{url}`'
+        )
+
+    def test_03_nested_create_query_budget(
+        self, catalog, django_assert_num_queries
+    ):
+        from reviews.models import Title
+
+        title, review = catalog
+        author = review.author
+        client = auth_client(author)
+        url = f'/api/v1/titles/{title.pk}/reviews/{review.pk}/comments/'
+        with django_assert_num_queries(QUERY_BUDGETS['comment_create']):
+            response = client.post(url, data={'text': 'Ещё комментарий'})
+        assert response.status_code == 201, (
+            f'Проверьте, что POST запрос `{url}` создаёт комментарий'
+        )
+        other_title = Title.objects.exclude(pk=title.pk).first()
+        url = f'/api/v1/titles/{other_title.pk}/reviews/'
+        with django_assert_num_queries(QUERY_BUDGETS['review_create']):
+            response = client.post(url, data={'text': 'Отзыв', 'score': 7})
+        assert response.status_code == 201, (
+            f'Проверьте, что POST запрос `{url}` создаёт отзыв'
+        )
+
+    def test_04_sparse_fields_query_budget(
+        self, client, catalog, django_assert_num_queries
+    ):
+        with django_assert_num_queries(2):
+            response = client.get(
+                '/api/v1/titles/', {'fields': 'id,name,rating', 'limit': 50}
+            )
+        title = response.json()['results'][0]
+        assert set(title) == {'id', 'name', 'rating'}, (
+            'Проверьте, что при GET запросе `/api/v1/titles/?fields=id,name,rating` '
+            'возвращаются только запрошенные поля'
+        )
+        response = client.get('/api/v1/titles/', {'exclude': 'genre,description'})
+        title = response.json()['results'][0]
+        assert set(title) == {'id', 'name', 'year', 'rating', 'category'}, (
+            'Проверьте, что при GET запросе `/api/v1/titles/?exclude=genre,description` '
+            'исключённые поля не возвращаются'
+        )
+        assert title['category'] == {'name': 'Фильм', 'slug': 'films'}, (
+            'Проверьте, что категория возвращается при ограничении полей'
+        )
+
+    def test_05_title_create_query_budget(
+        self, catalog, admin_client, django_assert_max_num_queries
+    ):
+        data = {
+            'name': 'Новое произведение', 'year': 2000,
+            'genre': ['drama', 'comedy'], 'category': 'films'
+        }
+        admin_client.get('/api/v1/genres/')
+        admin_client.get('/api/v1/categories/')
+        with django_assert_max_num_queries(QUERY_BUDGETS['title_create']):
+            response = admin_client.post('/api/v1/titles/', data=data)
+        assert response.status_code == 201, (
+            'Проверьте, что POST запрос `/api/v1/titles/` создаёт произведение'
+        )
+
+    def test_06_conditional_get(
+        self, client, catalog, django_assert_num_queries
+    ):
+        title, review = catalog
+        urls = (
+            '/api/v1/titles/',
+            '/api/v1/genres/',
+            '/api/v1/categories/',
+            f'/api/v1/titles/{title.pk}/reviews/',
+        )
+        etags = {}
+        for url in urls:
+            response = client.get(url)
+            assert response.has_header('ETag'), (
+                f'Проверьте, что ответ на GET запрос `{url}` содержит ETag'
+            )
+            assert response.has_header('Last-Modified'), (
+                f'Проверьте, что ответ на GET запрос `{url}` '
+                'содержит Last-Modified'
+            )
+            etags[url] = response['ETag']
+            with django_assert_num_queries(0):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == 304, (
+                f'Проверьте, что GET запрос `{url}` с совпадающим '
+                'If-None-Match возвращает 304 без запросов к БД'
+            )
+            with django_assert_num_queries(0):
+                response = client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+            assert response.status_code == 304, (
+                f'Проверьте, что GET запрос `{url}` с If-Modified-Since '
+                'не раньше Last-Modified возвращает 304'
+            )
+
+        other = get_user_model().objects.create(
+            username='newreviewer', email='newreviewer@yamdb.fake'
+        )
+        response = auth_client(other).post(
+            f'/api/v1/titles/{title.pk}/reviews/',
+            data={'text': 'Новый отзыв', 'score': 1}
+        )
+        assert response.status_code == 201
+        for url in ('/api/v1/titles/', f'/api/v1/titles/{title.pk}/reviews/'):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == 200, (
+                f'Проверьте, что после добавления отзыва GET запрос `{url}` '
+                'со старым ETag возвращает новые данные'
+            )
+        for url in ('/api/v1/genres/', '/api/v1/categories/'):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == 304, (
+                f'Проверьте, что добавление отзыва не меняет ETag `{url}`'
+            )
+
+    def test_07_response_cache(
+        self, client, catalog, django_assert_num_queries
+    ):
+        from api.v1.response_cache import response_cache_stats
+
+        title, review = catalog
+        stats = response_cache_stats()
+        urls = (
+            '/api/v1/titles/?limit=5',
+            f'/api/v1/titles/{title.pk}/',
+            f'/api/v1/titles/{title.pk}/reviews/?limit=5',
+            f'/api/v1/titles/{title.pk}/reviews/{review.pk}/comments/',
+            '/api/v1/titles/0/reviews/',
+            f'/api/v1/titles/{title.pk}/reviews/0/comments/',
+        )
+        for url in urls:
+            expected = client.get(url)
+            assert expected['X-Cache'] == 'MISS'
+            with django_assert_num_queries(0):
+                response = client.get(url)
+            assert response['X-Cache'] == 'HIT', (
+                f'Проверьте, что повторный GET запрос `{url}` '
+                'берётся из кэша без запросов к БД'
+            )
+            assert response.status_code == expected.status_code, (
+                f'Проверьте, что кэш сохраняет статус ответа `{url}`'
+            )
+            assert response.content == expected.content, (
+                f'Проверьте, что кэш возвращает тот же ответ `{url}`'
+            )
+        assert response_cache_stats() == {
+            'hit': stats['hit'] + len(urls),
+            'miss': stats['miss'] + len(urls),
+            'stale': stats['stale'],
+        }, 'Проверьте счётчики попаданий и промахов кэша ответов'
+
+        url = f'/api/v1/titles/{title.pk}/reviews/{review.pk}/comments/'
+        auth_client(review.author).post(url, data={'text': 'Новый'})
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS', (
+            'Проверьте, что новый комментарий сбрасывает кэш списка'
+        )
+        assert response.json()['count'] == 501
+        response = client.get(
+            f'/api/v1/titles/{title.pk}/', HTTP_AUTHORIZATION='Bearer x'
+        )
+        assert response.status_code == 401, (
+            'Проверьте, что ответы из кэша не отдаются с неверным токеном'
+        )
+
+    def test_08_single_flight(
+        self, client, catalog, settings, monkeypatch, tmp_path
+    ):
+        from api.v1.response_cache import FileLock
+
+        title, review = catalog
+        settings.RESPONSE_CACHE_LOCK_DIR = str(tmp_path)
+        url = f'/api/v1/titles/{title.pk}/'
+        expected = client.get(url)
+        assert expected['X-Cache'] == 'MISS'
+        assert not list(tmp_path.iterdir()), (
+            'Проверьте, что блокировка снимается после построения ответа'
+        )
+        title.name = 'Новое название'
+        title.save()
+
+        # ответ уже строит другой процесс
+        monkeypatch.setattr(FileLock, 'acquire', lambda lock: False)
+        response = client.get(url)
+        assert response['X-Cache'] == 'STALE', (
+            'Проверьте, что пока ответ строит другой процесс, '
+            'отдаётся прежняя версия'
+        )
+        assert response.content == expected.content
+        settings.RESPONSE_CACHE_LOCK_WAIT = 0.05
+        response = client.get(f'/api/v1/titles/{title.pk}/reviews/')
+        assert response['X-Cache'] == 'MISS', (
+            'Проверьте, что без прежней версии ответ строится '
+            'после ожидания'
+        )
+        monkeypatch.undo()
+        response = client.get(url)
+        assert response.json()['name'] == 'Новое название', (
+            'Проверьте, что после построения отдаётся новая версия'
+        )
+
+        lock = FileLock('test')
+        assert lock.acquire() and not FileLock('test').acquire(), (
+            'Проверьте, что блокировку нельзя взять дважды'
+        )
+        lock.release()
+        assert FileLock('test').acquire()
+
+    @pytest.mark.parametrize('limit', PAGE_SIZES)
+    def test_09_nested_query_budget(
+        self, client, catalog, settings, django_assert_max_num_queries, limit
+    ):
+        from reviews.models import Review
+
+        settings.NESTED_QUERY_MAX_LIMIT = max(PAGE_SIZES)
+        title, review = catalog
+        query = {'titles': {
+            'ids': [title.pk, title.pk + 1, 10 ** 6],
+            'fields': ['id', 'name', 'rating', 'category'],
+            'reviews': {
+                'limit': limit,
+                'fields': ['id', 'score'],
+                'author': {'fields': ['username']},
+                'comments': {'limit': 3, 'author': {}},
+            },
+        }}
+        with django_assert_max_num_queries(QUERY_BUDGETS['nested_query']):
+            response = client.post('/api/v1/query/', data=query,
+                                   content_type='application/json')
+        assert response.status_code == 200, (
+            'Проверьте, что POST запрос `/api/v1/query/` возвращает статус 200'
+        )
+        titles = response.json()['titles']
+        assert [item['id'] for item in titles] == [title.pk, title.pk + 1], (
+            'Проверьте, что произведения возвращаются в порядке ids, '
+            'несуществующие пропускаются'
+        )
+        assert set(titles[0]) == {'id', 'name', 'rating', 'category', 'reviews'}
+        assert titles[1]['reviews'] == []
+        reviews = titles[0]['reviews']
+        expected = Review.objects.filter(title=title).order_by(
+            '-pub_date', '-pk'
+        ).select_related('author')[:limit]
+        assert [
+            (item['id'], item['author']['username']) for item in reviews
+        ] == [(item.pk, item.author.username) for item in expected], (
+            'Проверьте, что `/api/v1/query/` возвращает не больше `limit` '
+            'последних отзывов с авторами'
+        )
+        commented = [item for item in reviews if item['id'] == review.pk]
+        if commented:
+            comments = commented[0]['comments']
+            assert len(comments) == 3 and set(comments[0]['author']) == {
+                'username'
+            }, (
+                'Проверьте, что комментарии возвращаются с авторами, '
+                'а об авторе отдаётся только username'
+            )
+
+        response = client.post('/api/v1/query/', data={'titles': {
+            'ids': [title.pk], 'reviews': {'likes': {}}
+        }}, content_type='application/json')
+        assert response.status_code == 400, (
+            'Проверьте, что неизвестные связи во вложенном запросе отклоняются'
+        )
+
+        response = client.post('/api/v1/query/', data={'titles': {
+            'ids': [title.pk], 'reviews': {'author': {'fields': ['bio']}}
+        }}, content_type='application/json')
+        assert response.status_code == 400, (
+            'Проверьте, что личные поля авторов недоступны во вложенном '
+            'запросе'
+        )
+
+    def test_10_single_flight_across_processes(
+        self, client, catalog, settings, monkeypatch, tmp_path
+    ):
+        from django.core.cache import cache
+        from api.v1.response_cache import CachedResponseMixin, FileLock
+
+        title, review = catalog
+        settings.RESPONSE_CACHE_LOCK_DIR = str(tmp_path)
+        settings.RESPONSE_CACHE_LOCK_WAIT = 0.05
+        keys = {}
+        for method in ('get_response_cache_key', 'get_stale_cache_key'):
+            original = getattr(CachedResponseMixin, method)
+
+            def recorder(view, request, original=original, method=method):
+                keys[method] = original(view, request)
+                return keys[method]
+            monkeypatch.setattr(CachedResponseMixin, method, recorder)
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+        client.get(url)
+        key = keys['get_response_cache_key']
+        stale_key = keys['get_stale_cache_key']
+        cache.delete_many((key, stale_key))
+
+        # ответ строит другой процесс, он же кладёт его в общий кэш
+        monkeypatch.setattr(FileLock, 'acquire', lambda lock: False)
+        other = (200, 'application/json', b'{"results": "other"}')
+
+        def other_worker_fills():
+            time.sleep(0.2)
+            cache.set(key, other, 60)
+
+        settings.RESPONSE_CACHE_LOCK_WAIT = 5
+        process = start_process(other_worker_fills)
+        response = client.get(url)
+        process.join()
+        assert response['X-Cache'] == 'HIT', (
+            'Проверьте, что ожидающий процесс получает ответ, построенный '
+            'другим процессом, а не строит его сам'
+        )
+        assert response.json() == {'results': 'other'}
+
+        cache.delete(key)
+        run_in_process(lambda: cache.set(stale_key, other, 60))
+        response = client.get(url)
+        assert response['X-Cache'] == 'STALE', (
+            'Проверьте, что прежняя версия, сохранённая другим процессом, '
+            'видна остальным'
+        )
+
+    def test_11_user_changes_keep_etag(self, client, catalog):
+        title, review = catalog
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+        etag = client.get(url)['ETag']
+
+        user = get_user_model().objects.create(
+            username='signup', email='signup@yamdb.fake'
+        )
+        user.bio = 'Новая биография'
+        user.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            'Проверьте, что регистрация пользователя и изменение полей, '
+            'которых нет в ответе, не меняют ETag отзывов'
+        )
+
+        review.author.username = 'renamed'
+        review.author.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что изменение имени автора меняет ETag отзывов'
+        )
+
+    def test_12_file_cache_culls_rarely(self, tmp_path, monkeypatch):
+        from api.cache import FileBasedCache
+
+        cache = FileBasedCache(str(tmp_path), {
+            'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_INTERVAL': 60}
+        })
+        listings = []
+        list_cache_files = cache._list_cache_files
+
+        def counting_list_cache_files():
+            listings.append(1)
+            return list_cache_files()
+
+        monkeypatch.setattr(
+            cache, '_list_cache_files', counting_list_cache_files
+        )
+        for number in range(10):
+            cache.set(f'key{number}', number)
+        assert len(listings) == 1, (
+            'Проверьте, что файловый кэш не читает весь каталог '
+            'при каждой записи'
+        )
+        assert cache.get('key9') == 9
+
+    def test_13_leading_zero_id_etag(self, client, catalog):
+        title, review = catalog
+        url = f'/api/v1/titles/0{title.pk}/reviews/'
+        etag = client.get(url)['ETag']
+        other = get_user_model().objects.create(
+            username='zeroreviewer', email='zeroreviewer@yamdb.fake'
+        )
+        response = auth_client(other).post(
+            f'/api/v1/titles/{title.pk}/reviews/',
+            data={'text': 'Новый отзыв', 'score': 1}
+        )
+        assert response.status_code == 201
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что ETag отзывов по адресу с id, записанным '
+            'с ведущим нулём, меняется после добавления отзыва'
+        )
+
+    def test_14_leading_zero_id_response_cache(self, client, catalog):
+        title, review = catalog
+        reviews_url = f'/api/v1/titles/{title.pk}/reviews/'
+        comments_url = f'{reviews_url}{review.pk}/comments/'
+        urls = {
+            reviews_url: f'/api/v1/titles/0{title.pk}/reviews/',
+            comments_url: (
+                f'/api/v1/titles/{title.pk}/reviews/0{review.pk}/comments/'
+            ),
+        }
+        counts = {url: client.get(url).json()['count'] for url in urls.values()}
+        other = get_user_model().objects.create(
+            username='zerocache', email='zerocache@yamdb.fake'
+        )
+        for url in urls:
+            response = auth_client(other).post(
+                url, data={'text': 'Новый', 'score': 1}
+            )
+            assert response.status_code == 201
+        for url in urls.values():
+            response = client.get(url)
+            assert response['X-Cache'] == 'MISS' and (
+                response.json()['count'] == counts[url] + 1
+            ), (
+                f'Проверьте, что кэш ответа `{url}` с id, записанным '
+                'с ведущим нулём, сбрасывается при изменении данных'
+            )
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+from django.contrib.auth import get_user_model
+
+
+@pytest.fixture
+def dataset(db):
+    from reviews.models import (Category, Comment, Genre, GenreTitle,
+                                Review, Title)
+
+    rnd = random.Random(42)
+    get_user_model().objects.bulk_create(
+        get_user_model()(username=f'user{i}', email=f'user{i}@yamdb.fake')
+        for i in range(20)
+    )
+    users = list(get_user_model().objects.all())
+    categories = [
+        Category.objects.create(name=f'Категория {i}', slug=f'category{i}')
+        for i in range(3)
+    ]
+    genres = [
+        Genre.objects.create(name=f'Жанр {i}', slug=f'genre{i}')
+        for i in range(5)
+    ]
+    for i in range(30):
+        title = Title.objects.create(
+            name=f'Произведение {rnd.randint(0, 1000)}',
+            year=rnd.randint(1900, 2020),
+            description=rnd.choice(('', 'Описание', 'Длинное описание')),
+            category=rnd.choice(categories + [None]),
+        )
+        for genre in rnd.sample(genres, rnd.randint(0, 3)):
+            GenreTitle.objects.create(title=title, genre=genre)
+        for author in rnd.sample(users, rnd.randint(0, 8)):
+            review = Review.objects.create(
+                title=title, author=author,
+                text=f'Отзыв {author.username}', score=rnd.randint(1, 10)
+            )
+            for comment_author in rnd.sample(users, rnd.randint(0, 3)):
+                Comment.objects.create(
+                    review=review, author=comment_author,
+                    text=f'Комментарий {comment_author.username}'
+                )
+    title = Title.objects.filter(rating_count__gte=3).first()
+    review = Review.objects.filter(comments__isnull=False).first()
+    return title, review
+
+
+def get_urls(title, review):
+    titles = '/api/v1/titles/'
+    reviews = f'/api/v1/titles/{title.pk}/reviews/'
+    comments = f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/comments/'
+    return (
+        titles,
+        f'{titles}?limit=100',
+        f'{titles}?offset=5&limit=7',
+        f'{titles}?genre=genre1',
+        f'{titles}?category=category0&count=none',
+        f'{titles}?fields=id,name,rating',
+        f'{titles}?exclude=genre,description',
+        f'{titles}?fields=genre,category',
+        reviews,
+        f'{reviews}?limit=100',
+        f'{reviews}?cursor=&limit=2',
+        f'{reviews}?fields=author,score',
+        comments,
+        f'{comments}?exclude=author',
+    )
+
+
+class Test09FastSerialization:
+
+    def test_01_fast_path_is_byte_identical(self, client, dataset, settings):
+        settings.RESPONSE_CACHE_TIMEOUT = 0
+        for url in get_urls(*dataset):
+            settings.FAST_LIST_SERIALIZATION = False
+            expected = client.get(url)
+            settings.FAST_LIST_SERIALIZATION = True
+            response = client.get(url)
+            assert response.status_code == expected.status_code == 200, (
+                f'Проверьте, что GET запрос `{url}` возвращает статус 200'
+            )
+            assert response.content == expected.content, (
+                f'Проверьте, что быстрый путь для `{url}` возвращает '
+                'тот же ответ, что и сериализатор'
+            )
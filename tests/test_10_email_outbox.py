@@ -0,0 +1,137 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('Почтовый сервер недоступен')
+
+
+class DroppingBackend(EmailBackend):
+    """
+    Как SMTP-бэкенд: open() не переоткрывает уже открытое соединение,
+    а первое соединение разрывается сервером.
+    """
+
+    connection = None
+    drops = 0
+    opened = 0
+
+    def open(self):
+        if self.connection is not None:
+            return False
+        self.connection = 'open'
+        DroppingBackend.opened += 1
+        return True
+
+    def close(self):
+        self.connection = None
+
+    def send_messages(self, messages):
+        self.open()
+        if DroppingBackend.drops:
+            DroppingBackend.drops -= 1
+            self.connection = 'dropped'
+        if self.connection == 'dropped':
+            raise ConnectionError('Соединение разорвано')
+        return super().send_messages(messages)
+
+
+class Test10EmailOutbox:
+
+    @pytest.mark.django_db
+    def test_01_signup_enqueues_email(self, client):
+        from users.models import OutboxEmail
+
+        data = {'email': 'outbox@yamdb.fake', 'username': 'outbox'}
+        response = client.post('/api/v1/auth/signup/', data=data)
+        assert response.status_code == 200
+        email = OutboxEmail.objects.get()
+        assert email.recipient == data['email'] and email.sent_at is None, (
+            'Проверьте, что при регистрации письмо записывается в очередь'
+        )
+        client.post('/api/v1/auth/signup/', data={
+            'email': 'other@yamdb.fake', 'username': 'outbox'
+        })
+        assert OutboxEmail.objects.count() == 1, (
+            'Проверьте, что при ошибке регистрации письмо не ставится в очередь'
+        )
+
+    @pytest.mark.django_db
+    def test_02_worker_batches(self, settings):
+        from users import outbox
+        from users.models import OutboxEmail
+
+        for i in range(5):
+            outbox.enqueue('Тема', f'Письмо {i}', f'user{i}@yamdb.fake')
+        output = StringIO()
+        call_command('send_emails', batch_size=2, stdout=output)
+        assert len(mail.outbox) == 5, (
+            'Проверьте, что команда send_emails отправляет все письма'
+        )
+        assert output.getvalue().count('Пачка') == 3, (
+            'Проверьте, что письма отправляются пачками'
+        )
+        assert not OutboxEmail.objects.filter(sent_at__isnull=True).exists()
+        call_command('send_emails', stdout=StringIO())
+        assert len(mail.outbox) == 5, (
+            'Проверьте, что отправленные письма не отправляются повторно'
+        )
+
+    @pytest.mark.django_db
+    def test_03_worker_retries_with_backoff(self, settings):
+        from users import outbox
+        from users.models import OutboxEmail
+
+        settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 2
+        email = outbox.enqueue('Тема', 'Письмо', 'user@yamdb.fake')
+        stats = outbox.deliver_batch(FailingBackend())
+        assert stats['retried'] == 1 and stats['sent'] == 0
+        email.refresh_from_db()
+        assert email.attempts == 1 and 'ConnectionError' in email.last_error
+        assert email.next_attempt_at >= timezone.now() + timedelta(
+            seconds=settings.EMAIL_OUTBOX_RETRY_DELAY - 1
+        ), 'Проверьте, что повторная отправка откладывается'
+        assert outbox.deliver_batch(EmailBackend())['sent'] == 0, (
+            'Проверьте, что письмо не отправляется до следующей попытки'
+        )
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        stats = outbox.deliver_batch(FailingBackend())
+        assert stats['failed'] == 1, (
+            'Проверьте, что после последней попытки письмо не доставлено'
+        )
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        assert outbox.deliver_batch(EmailBackend())['sent'] == 0, (
+            'Проверьте, что попытки отправки ограничены'
+        )
+
+    @pytest.mark.django_db
+    def test_04_worker_reopens_dropped_connection(self, settings):
+        from users import outbox
+        from users.models import OutboxEmail
+
+        for i in range(3):
+            outbox.enqueue('Тема', f'Письмо {i}', f'user{i}@yamdb.fake')
+        DroppingBackend.drops = 1
+        stats = outbox.deliver_batch(DroppingBackend())
+        assert (stats['sent'], stats['retried']) == (2, 1), (
+            'Проверьте, что после ошибки отправки соединение открывается заново'
+        )
+
+        OutboxEmail.objects.all().delete()
+        for i in range(2):
+            outbox.enqueue('Тема', f'Письмо {i}', f'user{i}@yamdb.fake')
+        settings.EMAIL_BACKEND = 'tests.test_10_email_outbox.DroppingBackend'
+        DroppingBackend.opened = 0
+        call_command('send_emails', batch_size=1, stdout=StringIO())
+        assert len(mail.outbox) == 4
+        assert DroppingBackend.opened == 2, (
+            'Проверьте, что каждая пачка отправляется через новое соединение'
+        )
@@ -0,0 +1,104 @@
+import csv
+import os
+import threading
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from .conftest import MANAGE_PATH
+
+DATA_DIR = os.path.join(MANAGE_PATH, 'static', 'data')
+
+
+def csv_rows(name):
+    with open(os.path.join(DATA_DIR, name), newline='') as csvfile:
+        return sum(1 for _ in csv.DictReader(csvfile))
+
+
+class Test11ImportCsv:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('atomic_file', (False, True))
+    def test_01_import_in_batches(self, client, atomic_file):
+        from reviews.models import Review, Title
+
+        out = StringIO()
+        args = ['--batch-size', '10'] + (['--atomic-file'] if atomic_file else [])
+        call_command('import_csv', *args, verbosity=2, stdout=out)
+        output = out.getvalue()
+        assert output.rstrip().endswith('Данные добавлены!')
+        assert Review.objects.count() == csv_rows('review.csv'), (
+            'Проверьте, что `import_csv` загружает все строки файла пачками'
+        )
+        assert f'review.csv: загружено строк {csv_rows("review.csv")}' in output
+        assert 'review.csv: строк 10,' in output, (
+            'Проверьте, что `import_csv -v 2` сообщает о каждой пачке'
+        )
+        title = Title.objects.exclude(rating_count=0).first()
+        response = client.get(f'/api/v1/titles/{title.pk}/')
+        assert response.json()['rating'] is not None, (
+            'Проверьте, что после загрузки пересчитываются рейтинги'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_invalid_batch_size(self):
+        from django.core.management.base import CommandError
+
+        with pytest.raises(CommandError):
+            call_command('import_csv', '--batch-size', '0')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_parallel_import(self):
+        from django.apps import apps
+        from reviews.management.commands.import_csv import (Command,
+                                                             dependency_levels)
+
+        models = {
+            fixture: apps.get_model(app, model)
+            for fixture, app, model in Command.DATA
+        }
+        levels = dependency_levels(list(models.values()))
+        assert [
+            sorted(model._meta.model_name for model in level) for level in levels
+        ] == [
+            ['category', 'genre', 'user'], ['title'],
+            ['genretitle', 'review'], ['comment'],
+        ], (
+            'Проверьте, что независимые таблицы попадают в один уровень загрузки, '
+            'а зависимые - после тех, на которые ссылаются'
+        )
+
+        out = StringIO()
+        call_command(
+            'import_csv', '--parallel', '--workers', '2', '--batch-size', '10',
+            stdout=out
+        )
+        for fixture, model in models.items():
+            assert model.objects.count() == csv_rows(fixture), (
+                f'Проверьте, что `import_csv --parallel` загружает все строки {fixture}'
+            )
+            assert f'{fixture}: загружено строк {csv_rows(fixture)}' in out.getvalue()
+        assert 'разбор' in out.getvalue(), (
+            'Проверьте, что `import_csv --parallel` сообщает время разбора и записи'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_parallel_import_sqlite_main_thread(self, monkeypatch):
+        from reviews.management.commands.import_csv import Command
+
+        threads = set()
+        load_file = Command.load_file
+
+        def recording_load_file(command, *args):
+            threads.add(threading.current_thread())
+            return load_file(command, *args)
+
+        monkeypatch.setattr(Command, 'load_file', recording_load_file)
+        call_command(
+            'import_csv', '--parallel', '--workers', '2', stdout=StringIO()
+        )
+        assert threads == {threading.main_thread()}, (
+            'Проверьте, что на SQLite `import_csv --parallel` загружает файлы '
+            'в основном потоке, не открывая подключение на каждый уровень'
+        )